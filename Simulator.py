@@ -9,12 +9,9 @@ For SWIFT-ASCENT
 
 # !/usr/bin/env python
 import cmath
-import json
 import math
-import os
-import pickle
+import multiprocessing
 import random
-from pathlib import Path
 from typing import Tuple
 import matplotlib
 import matplotlib.pyplot as plt
@@ -25,10 +22,18 @@ import pandas as pd
 from Geometry3D import *
 from flask import Flask, request, jsonify
 from matplotlib.lines import Line2D
-from scipy import optimize
 from shapely import geometry
 from tqdm import tqdm
 from weather import get_weather
+import antenna
+import blockage
+import channel_plan
+import interference
+import building_store
+import viewshed
+import pathloss
+import results
+import ue_drop
 import warnings
 from matplotlib.offsetbox import AnchoredText
 
@@ -47,6 +52,57 @@ def get_weather_json(latitude, longitude):
         print('Could not retrieve weather information for the given location')
 
 
+# indexes of the buildings which can block the BS to FSS link, every building when there is no spatial index
+def nearby_buildings(BS_X, BS_Y, FSS_X, FSS_Y, ctx):
+    building_index = getattr(ctx, "building_index", None)
+    if building_index is None:
+        return range(len(ctx.buildings))
+    return building_index.query_segment((BS_X, BS_Y), (FSS_X, FSS_Y)).tolist()
+
+
+# Number of walls (blockage_mode "walls") or buildings ("buildings") crossed by the BS to FSS link.
+# In the default "boolean" mode the search stops at the first blocking wall and the result is 0 or 1.
+# Geometry3D misses some of the crossings of a wall, which does not matter to the LOS of "boolean" mode
+# but undercounts the other modes, so every engine counts walls and buildings with blockage.count_crossings.
+def link_crossings(BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, ctx):
+    blockage_mode = getattr(ctx, "blockage_mode", "boolean")
+    crossings = batch_crossings(BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, ctx)
+    if crossings is not None:
+        return int(crossings[0, 0])
+    nearby = nearby_buildings(BS_X, BS_Y, FSS_X, FSS_Y, ctx)
+    if blockage_mode != "boolean":
+        walls, owners = ctx.buildings.walls_of(nearby)
+        return int(blockage.count_crossings(
+            [BS_X, BS_Y, BS_Z], [FSS_X, FSS_Y, FSS_Z], ctx.buildings.wall_quads[walls], owners, per=blockage_mode,
+        )[0])
+
+    bs_to_fss_segment = Segment(Point(BS_X, BS_Y, BS_Z), Point(FSS_X, FSS_Y, FSS_Z))
+    for i in tqdm(nearby):
+        for w, polygon in enumerate(ctx.buildings[i].wall_polygons):
+            coordinates = los_key((BS_X, BS_Y, BS_Z), (FSS_X, FSS_Y, FSS_Z), i, w, ctx)
+            blocked = ctx.saved_los.get(coordinates)
+            if blocked is None:
+                blocked = intersection(bs_to_fss_segment, polygon) is not None
+                ctx.saved_los[coordinates] = blocked
+            if blocked:
+                return 1
+    return 0
+
+
+# penetration loss (dB) per crossing for the path loss kernels, None for the LOS/NLOS switch of "boolean" mode
+def link_penetration_loss(ctx):
+    if getattr(ctx, "blockage_mode", "boolean") == "boolean":
+        return None
+    return ctx.penetration_loss
+
+
+# key of the LOS of wall of building (an index into ctx.buildings) in ctx.saved_los, with the absolute
+# endpoints and the global id of the building in the tile cache, so keys stay valid for other FSS
+def los_key(start, end, building, wall, ctx):
+    origin = (ctx.x_FSS, ctx.y_FSS, 0)
+    return ctx.saved_los.key(np.add(start, origin), np.add(end, origin), ctx.buildings.ids[building], wall)
+
+
 def get_exclusion_zone_x_parameter(keys, x_pos_real):
     for i, key in enumerate(keys):
         if key > x_pos_real:
@@ -59,107 +115,17 @@ def get_exclusion_zone_x_parameter(keys, x_pos_real):
     return len(keys) + 1
 
 
-def path_loss_UMi(BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, ctx):
-    ##UMi
-    ##LOS,SF=4:
-
-    buildings = ctx.buildings
+# crossings: walls or buildings crossed by the BS to FSS link when a batched engine already counted them
+# the path loss itself is pathloss.umi_path_loss, the array version for many links
+def path_loss_UMi(BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, ctx, crossings=None):
     saved_los = ctx.saved_los
-    ##(10m<=d_2D)<=D_BP:
-    # RR - these variables needed as input
-    h = 5
-    d_2D = math.sqrt(
-        ((FSS_X - BS_X) ** 2) + ((FSS_Y - BS_Y) ** 2) + ((FSS_Z - BS_Z) ** 2)
+    if crossings is None:
+        crossings = link_crossings(BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, ctx)
+    path_loss_UMi, d_2D = pathloss.umi_path_loss(
+        BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, crossings, ctx.rain_attenuation, link_penetration_loss(ctx)
     )
-    hBs = 10
-    fc = 12
-    d_3D = math.sqrt(hBs ** 2 + d_2D ** 2)
-    PL1umi = 32.4 + 21 * math.log10(d_3D) + 20 * math.log10(fc)
-
-    ##(D_BP<=d_2D)<=5000m:
-    hBs = 10
-    hUT = 4.5
-    hE = 1
-    hBs1 = hBs - hE
-    hUT1 = hUT - hE
-    c = 3e8
-    D_BP = (4 * hBs1 * hUT1 * 12e9) / c
-    PL2umi = (
-            32.4
-            + 40 * math.log10(d_3D)
-            + 20 * math.log10(fc)
-            - 9.5 * math.log10((D_BP) ** 2 + (hBs - hUT) ** 2)
-    )
-
-    PLUMiLOS = 0
-    PL1umiNLOS = 0
-    # weather = get_weather_json(latitude=ctx.lat_FSS, longitude=ctx.lon_FSS)
-    # rain = weather["rain"]
-    # x = weather["rain"]["1h"] #rain_rate
-    rain = ctx.rain
-    x = ctx.rain_rate
-
-    if rain:
-        # x is the rain rate mm/h
-        P = -5.520 * 10 ** -12 * x ** 3 + 3.26 * 10 ** -9 * x ** 2 - 1.21 * x * 10 ** -7 - 6 * 10 ** -6  # av (considering vertical polarization)
-        Q = 8 * 10 ** -10 * x ** 3 - 4.552 * 10 ** -7 * x ** 2 - 3.03 * x * 10 ** -5 + 0.001  # bv (considering vertical polarization)
-        R = -5.71 * 10 ** -9 * x ** 3 + 6 * 10 ** -7 * x ** 2 + 8.707 * x * 10 ** -3 - 0.018  # cv (considering vertical polarization)
-        S = - 1.073 * 10 ** -7 * x ** 3 + 1.068 * 10 ** -4 * x ** 2 - 0.0598 * x + 0.0442  # dv (considering vertical polarization)
-
-        # Attenuation Factor due to rain
-        A = (P * (fc ** 3) + Q * (fc ** 2) + R * fc + S) / 1000  # (dB/m)
-
-        if 10 <= d_2D and d_2D <= D_BP:
-            PLUMiLOS = PL1umi + A
-        elif D_BP <= d_2D and d_2D <= 5000:
-            PLUMiLOS = PL2umi + A
-        else:
-            PLUMiLOS = 1 + A
-
-            ##NLOS,SF=7.82:
-        PL1umiNLOS = (
-                             35.3 * math.log10(d_3D) + 22.4 + 21.3 * math.log10(fc) - 0.3 * (hUT - 1.5)
-                     ) + A
-    else:
-
-        if 10 <= d_2D and d_2D <= D_BP:
-            PLUMiLOS = PL1umi
-        elif D_BP <= d_2D and d_2D <= 5000:
-            PLUMiLOS = PL2umi
-        else:
-            PLUMiLOS = 1
-
-        ##NLOS,SF=7.82:
-        PL1umiNLOS = (
-                35.3 * math.log10(d_3D) + 22.4 + 21.3 * math.log10(fc) - 0.3 * (hUT - 1.5)
-        )
-
-    PLUMiNLOS = max(PLUMiLOS, PL1umiNLOS)
-
-    line_of_sight = True
-
-    for i in tqdm(range(len(buildings))):
-        for polygon in buildings[i].wall_polygons:
-            coordinates = ((BS_X, BS_Y, BS_Z), (FSS_X, FSS_Y, FSS_Z), *[(p.x, p.y, p.z) for p in polygon.points])
-            # polygon_hash = hash(polygon)
-            # if (bs_to_fss_segment_hash, polygon_hash) in saved_los:
-            if coordinates in saved_los:
-                if saved_los.get(coordinates):
-                    path_loss_UMi = PLUMiNLOS
-                    line_of_sight = False
-                else:
-                    path_loss_UMi = PLUMiLOS
-            else:
-                bs_to_fss_segment = Segment(Point(BS_X, BS_Y, BS_Z), Point(FSS_X, FSS_Y, FSS_Z))
-                # bs_to_fss_segment_hash = hash(bs_to_fss_segment)
-                # polygon_hash = hash(polygon)
-                if intersection(bs_to_fss_segment, polygon) is not None:
-                    path_loss_UMi = PLUMiNLOS
-                    line_of_sight = False
-                    saved_los[coordinates] = True
-                else:
-                    path_loss_UMi = PLUMiLOS
-                    saved_los[coordinates] = False
+    path_loss_UMi, d_2D = float(path_loss_UMi), float(d_2D)
+    line_of_sight = crossings == 0
 
     ##realistic pathloss:
     # bs_to_fss_segment = Segment(Point(BS_X, BS_Y, BS_Z), Point(FSS_X, FSS_Y, FSS_Z))
@@ -226,71 +192,15 @@ def path_loss_UMi(BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, ctx):
 # In[ ]:
 
 
-def path_loss_UMa(BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, ctx):
-    ##LOS,SF=4:
-    ##(10m<=d_2D)<=D_BP:
-    # RR - these variables needed as input
-    buildings = ctx.buildings
-    saved_los = ctx.saved_los
-    fc = 12
-    h = 5
-    d_2D = math.sqrt(((FSS_X - BS_X) ** 2) + (FSS_Y - BS_Y) ** 2) + (
-            (FSS_Z - BS_Z) ** 2
-    )
-    hBs = 25
-    d_3D = math.sqrt(hBs ** 2 + d_2D ** 2)
-    PL3uma = 28.0 + 22 * math.log10(d_3D) + 20 * math.log10(fc)
-
-    ##(D_BP<=d_2D) <=5000m:
-    hUT = 4.5
-    hE = 1
-    hBs1 = hBs - hE
-    hUT1 = hUT - hE
-    c = 3 * 10 ** 8
-    D_BP = (4 * hBs1 * hUT1 * fc) / c
-    PL4uma = (
-            28.0
-            + 40 * math.log10(d_3D)
-            + 20 * math.log10(fc)
-            - 9 * math.log10((D_BP) ** 2 + (hBs - hUT) ** 2)
+# the path loss itself is pathloss.uma_path_loss, the array version for many links
+def path_loss_UMa(BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, ctx, crossings=None):
+    if crossings is None:
+        crossings = link_crossings(BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, ctx)
+    path_loss_UMa, d_2D = pathloss.uma_path_loss(
+        BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, crossings, link_penetration_loss(ctx)
     )
-
-    if 10 <= d_2D and d_2D <= D_BP:
-        PLUMALOS = PL3uma
-    elif D_BP <= d_2D and d_2D <= 5000:
-        PLUMALOS = PL4uma
-    else:
-        PLUMALOS = 1
-
-    ##NLOS,SF=6:
-    PL1NLOSuma = (
-            13.54 + 39.08 * math.log10(d_3D) + 20 * math.log10(fc) - 0.6 * (hUT - 1.5)
-    )
-    PLUMANLOS = max(PLUMALOS, PL1NLOSuma)
-
-    line_of_sight = True
-
-    # realisticpathlossmodified
-    bs_to_fss_segment = Segment(Point(BS_X, BS_Y, BS_Z), Point(FSS_X, FSS_Y, FSS_Z))
-    bs_to_fss_segment_hash = hash(bs_to_fss_segment)
-
-    all_polygons = [(i, polygon) for i, building in enumerate(buildings) for polygon in building.wall_polygons]
-
-    for i, polygon in tqdm(all_polygons):
-        polygon_hash = hash(polygon)
-        if (bs_to_fss_segment_hash, polygon_hash) in saved_los:
-            if saved_los.get((bs_to_fss_segment_hash, polygon_hash)):
-                path_loss_UMa = PLUMANLOS
-                line_of_sight = False
-            else:
-                path_loss_UMa = PLUMALOS
-        elif intersection(bs_to_fss_segment, polygon) is not None:
-            path_loss_UMa = PLUMANLOS
-            line_of_sight = False
-            saved_los[(bs_to_fss_segment_hash, polygon_hash)] = True
-        else:
-            path_loss_UMa = PLUMALOS
-            saved_los[(bs_to_fss_segment_hash, polygon_hash)] = False
+    path_loss_UMa, d_2D = float(path_loss_UMa), float(d_2D)
+    line_of_sight = crossings == 0
 
     return path_loss_UMa, d_2D, line_of_sight
 
@@ -321,75 +231,15 @@ def path_loss_UMa(BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, ctx):
 # In[ ]:
 
 
-def path_loss_RMa(BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, ctx):
-    buildings = ctx.buildings
-    saved_los = ctx.saved_los
-    ##LOS,SF=4(PL1),SF=6(PL2)
-    ##10m<=d_2D<=d_BP:
-    # RR - these variables needed as input
-    fc = 12
-    h = 5
-    d_2D = math.sqrt(
-        ((FSS_X - BS_X) ** 2) + ((FSS_Y - BS_Y) ** 2) + ((FSS_Z - BS_Z) ** 2)
-    )
-    hBs = 35
-    d_3D = math.sqrt(hBs ** 2 + d_2D ** 2)
-    PL1rma = (
-            20 * math.log10((40 * math.pi * d_3D * fc) / 3)
-            + min(0.03 * h ** 1.72, 10) * math.log10(d_3D)
-            - min(0.044 * h ** 1.72, 14.77)
-            + 0.002 * math.log10(h) * d_3D
-    )
-
-    ##d_BP<=d_2D<=10km:
-    hUT = 4.5
-    c = 3 * 10 ** 8
-    d_BP = (2 * math.pi * hBs * hUT * fc) / c
-    PL2rma = PL1rma * (d_BP) + 40 * math.log10(d_3D / d_BP)
-
-    if 10 <= d_2D and d_2D <= d_BP:
-        PLRMALOS = PL1rma
-    elif d_BP <= d_2D and d_2D <= 10000:
-        PLRMALOS = PL2rma
-    else:
-        PLRMALOS = 1
-
-    ##NLOS,SF=8:
-    W = 20
-    h = 5
-    PL1NLOSrma = (
-            161.04
-            - 7.11 * math.log10(W)
-            + 7.5 * math.log10(h)
-            - (24.37 - 3.7 * (h / hBs) ** 2) * math.log10(hBs)
-            + (43.42 - 3.1 * math.log10(hBs)) * (math.log10(d_3D) - 3)
-            + 20 * math.log10(fc)
-            - (3.2 * (math.log10(11.75 * hUT)) ** 2 - 4.97)
+# the path loss itself is pathloss.rma_path_loss, the array version for many links
+def path_loss_RMa(BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, ctx, crossings=None):
+    if crossings is None:
+        crossings = link_crossings(BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, ctx)
+    path_loss_RMa, d_2D = pathloss.rma_path_loss(
+        BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, crossings, link_penetration_loss(ctx)
     )
-    PLRMANLOS = max(PLRMALOS, PL1NLOSrma)
-
-    line_of_sight = True
-    # realisticpathlossmodified
-    bs_to_fss_segment = Segment(Point(BS_X, BS_Y, BS_Z), Point(FSS_X, FSS_Y, FSS_Z))
-    bs_to_fss_segment_hash = hash(bs_to_fss_segment)
-
-    all_polygons = [(i, polygon) for i, building in enumerate(buildings) for polygon in building.wall_polygons]
-
-    for i, polygon in tqdm(all_polygons):
-        polygon_hash = hash(polygon)
-        if (bs_to_fss_segment_hash, polygon_hash) in saved_los:
-            if saved_los.get((bs_to_fss_segment_hash, polygon_hash)):
-                path_loss_RMa = PLRMANLOS
-                line_of_sight = False
-            else:
-                path_loss_RMa = PLRMALOS
-        elif intersection(bs_to_fss_segment, polygon) is not None:
-            path_loss_RMa = PLRMANLOS
-            line_of_sight = False
-            saved_los[(bs_to_fss_segment_hash, polygon_hash)] = True
-        else:
-            path_loss_RMa = PLRMALOS
-            saved_los[(bs_to_fss_segment_hash, polygon_hash)] = False
+    path_loss_RMa, d_2D = float(path_loss_RMa), float(d_2D)
+    line_of_sight = crossings == 0
 
     return path_loss_RMa, d_2D, line_of_sight
 
@@ -461,6 +311,57 @@ def path_loss_RMa(BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, ctx):
 # In[ ]:
 
 
+# returns a (BS, FSS) matrix of crossings (see link_crossings), or None when ctx.los_engine tests links one by one
+def batch_crossings(BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, ctx):
+    crossings = scenario_crossings(BS_X, BS_Y, [BS_Z], FSS_X, FSS_Y, FSS_Z, ctx)
+    return None if crossings is None else crossings[0]
+
+
+# (heights, BS, FSS) crossings of the links from every BS raised to each of the heights (one per
+# deployment scenario), or None when ctx.los_engine tests links one by one. The buildings near each link
+# and their walls are gathered once for all the heights.
+# engines: "vectorized" tests every wall quad with NumPy, "prism" tests every footprint once with shapely,
+# both exactly like the Geometry3D engine, "viewshed" looks the BS up in the viewshed raster of the FSS,
+# an approximation which can disagree on links passing close to buildings (see viewshed.Viewshed)
+def scenario_crossings(BS_X, BS_Y, heights, FSS_X, FSS_Y, FSS_Z, ctx):
+    los_engine = getattr(ctx, "los_engine", "geometry3d")
+    if los_engine not in ("vectorized", "prism", "viewshed"):
+        return None
+    blockage_mode = getattr(ctx, "blockage_mode", "boolean")
+    first_hit = blockage_mode == "boolean"
+
+    heights = np.asarray(heights, dtype=float)
+    bs_points = np.column_stack(np.broadcast_arrays(BS_X, BS_Y)).astype(float)
+    fss_points = np.column_stack(np.broadcast_arrays(FSS_X, FSS_Y, FSS_Z)).astype(float)
+    if los_engine == "viewshed":
+        if blockage_mode != "boolean":
+            raise ValueError("The viewshed LOS engine only tells LOS from NLOS")
+        if not (fss_points == (ctx.x, ctx.y, ctx.viewshed.observer_height)).all():
+            raise ValueError("The viewshed LOS engine only covers links to the FSS it was computed for")
+        blocked = ~ctx.viewshed.line_of_sight(bs_points[None, :, 0], bs_points[None, :, 1], heights[:, None])
+        return np.repeat(blocked.astype(int)[:, :, None], len(fss_points), axis=2)
+    if los_engine == "prism" and blockage_mode == "walls":
+        raise ValueError("The prism LOS engine counts buildings, not walls")
+
+    crossings = np.zeros((len(heights), len(bs_points), len(fss_points)), dtype=int)
+    for i, start in enumerate(bs_points):
+        starts = np.column_stack([np.repeat(start[None, :], len(heights), axis=0), heights])
+        for j, end in enumerate(fss_points):
+            nearby = nearby_buildings(*start, *end[:2], ctx)
+            if los_engine == "prism":
+                crossings[:, i, j] = blockage.prism_crossings_heights(
+                    start, heights, end, [ctx.buildings[k].xy_polygon for k in nearby],
+                    [ctx.buildings[k].height for k in nearby], first_hit=first_hit,
+                )
+            else:
+                walls, owners = ctx.buildings.walls_of(nearby)
+                crossings[:, i, j] = blockage.count_crossings(
+                    starts, np.repeat(end[None, :], len(heights), axis=0), ctx.buildings.wall_quads[walls],
+                    owners, per="buildings" if blockage_mode == "buildings" else "walls", first_hit=first_hit,
+                )
+    return crossings
+
+
 def Interface_UMi_1(
         BS_X,
         BS_Y,
@@ -473,6 +374,11 @@ def Interface_UMi_1(
         theta_tilt,
         phi_scan,
         output=False,
+        codebook=None,
+        beam=None,
+        fss_pattern=antenna.fss_gain_wbes_b,
+        element_pattern=antenna.element_gain,
+        geometry=antenna.DEFAULT_ARRAY,
 ):
     LBodyLoss = 4
     #         LSpectralOverlap=10*math.log(10)
@@ -485,8 +391,8 @@ def Interface_UMi_1(
     if output:
         print("theta_bs_es:", theta_bs_es, "phi_bs_es:", phi_bs_es)
 
-    G_5G_R = gain_5g(theta_bs_es, phi_bs_es, theta_tilt, phi_scan)
-    G_Rx_5G = gain_fss_wbes_b(fss_phi_difference)
+    G_5G_R = bs_gain(theta_bs_es, phi_bs_es, theta_tilt, phi_scan, codebook, beam, element_pattern, geometry)
+    G_Rx_5G = float(fss_pattern(fss_phi_difference))
 
     TXPower = -6.77
     #         LBuildingLoss=1
@@ -506,6 +412,11 @@ def Interface_UMa_1(
         theta_tilt,
         phi_scan,
         output=False,
+        codebook=None,
+        beam=None,
+        fss_pattern=antenna.fss_gain_wbes_b,
+        element_pattern=antenna.element_gain,
+        geometry=antenna.DEFAULT_ARRAY,
 ):
     LBodyLoss = 4
     #         LSpectralOverlap=10*math.log(10)
@@ -516,8 +427,8 @@ def Interface_UMa_1(
     fss_phi_difference = abs(FSS_phi - phi_bs_es)
     # if output: print("theta_bs_es:", theta_bs_es, "phi_bs_es:", phi_bs_es)
 
-    G_5G_R = gain_5g(theta_bs_es, phi_bs_es, theta_tilt, phi_scan)
-    G_Rx_5G = gain_fss_wbes_b(fss_phi_difference)
+    G_5G_R = bs_gain(theta_bs_es, phi_bs_es, theta_tilt, phi_scan, codebook, beam, element_pattern, geometry)
+    G_Rx_5G = float(fss_pattern(fss_phi_difference))
 
     TXPower = -6.77
     #         LBuildingLoss=1
@@ -537,6 +448,11 @@ def Interface_RMa_1(
         theta_tilt,
         phi_scan,
         output=False,
+        codebook=None,
+        beam=None,
+        fss_pattern=antenna.fss_gain_wbes_b,
+        element_pattern=antenna.element_gain,
+        geometry=antenna.DEFAULT_ARRAY,
 ):
     LBodyLoss = 4
     #         LSpectralOverlap=10*math.log(10)
@@ -549,8 +465,8 @@ def Interface_RMa_1(
     if output:
         print("fss_phi_difference:", fss_phi_difference)
 
-    G_5G_R = gain_5g(theta_bs_es, phi_bs_es, theta_tilt, phi_scan)
-    G_Rx_5G = gain_fss_wbes_b(fss_phi_difference)
+    G_5G_R = bs_gain(theta_bs_es, phi_bs_es, theta_tilt, phi_scan, codebook, beam, element_pattern, geometry)
+    G_Rx_5G = float(fss_pattern(fss_phi_difference))
 
     TXPower = -6.77
     #         LBuildingLoss=1
@@ -558,374 +474,326 @@ def Interface_RMa_1(
     return interface3, pathloss_RMa
 
 
-def simulate(output=True, ctx=None):
-    FSS_X = np.array([])
-    FSS_Y = np.array([])
-    FSS_Z = np.array([])
-    FSS_CHANNELS = []
-    x = ctx.x
-    y = ctx.y
-    z = ctx.z
-    FSS_phi = ctx.FSS_phi
-    Noise_W = ctx.Noise_W
+# Links of the request which do not change between Monte Carlo drops: the FSS and BS positions, and the
+# crossings, path loss, distance and line of sight of every BS to FSS link. Links are numbered
+# i * len(FSS_X) + j from BS i to FSS j.
+class StaticLinks:
+    def __init__(self, FSS_X, FSS_Y, FSS_Z, BS_X, BS_Y, BS_Z, crossings, path_losses, distances, line_of_sight):
+        self.FSS_X, self.FSS_Y, self.FSS_Z = FSS_X, FSS_Y, FSS_Z
+        self.BS_X, self.BS_Y, self.BS_Z = BS_X, BS_Y, BS_Z
+        # scenario -> (BS, FSS) array of the walls or buildings crossed
+        self.crossings = crossings
+        # scenario -> path loss (dB) of every link
+        self.path_losses = path_losses
+        self.distances = distances
+        self.line_of_sight = line_of_sight
+
+
+# static phase of a request, computed once before the Monte Carlo drops of simulate
+def static_links(output=True, ctx=None) -> StaticLinks:
     data_within_zone = ctx.data_within_zone
     base_station_count = ctx.base_station_count
-    radius = ctx.radius
     R = ctx.R
 
-    for i in range(1):
-        FSS_X = np.append(FSS_X, x)
-        FSS_Y = np.append(FSS_Y, y)
-        FSS_Z = np.append(FSS_Z, 4.5)
-        # 0 means not in use, 1 means in use
-        channel_status = [
-            random.randint(0, 1) for i in range(FSS_Channels.channel_count)
-        ]
-        channels_used = np.array(
-            [i for i in range(FSS_Channels.channel_count) if channel_status[i] == 1]
-        )
-        FSS_CHANNELS.append(channels_used)
-        if output:
-            print(
-                "FSS Co-ordinates="
-                + str(x)
-                + ","
-                + str(y)
-                + ","
-                + str(z)
-                + ", channel: "
-                + str(channels_used)
-            )
+    FSS_X = np.array([ctx.x], dtype=float)
+    FSS_Y = np.array([ctx.y], dtype=float)
+    FSS_Z = np.array([4.5])
     if output:
-        print(FSS_X, FSS_Y, FSS_Z, FSS_CHANNELS)
+        print(FSS_X, FSS_Y, FSS_Z)
 
     # Create base stations
-    BS_X = np.array([])
-    BS_Y = np.array([])
-    BS_Z = np.array([])
-
-    # Randomly select base stations
-    # base_station_indexes = random.sample(range(len(data_within_zone)), base_station_count)
-
-    # for i in base_station_indexes:
-    for i in range(base_station_count):
-        lat_BS, lon_BS = (
-            data_within_zone.iloc[i]["latitude"],
-            data_within_zone.iloc[i]["longitude"],
-        )
-        # bs1 = BS(radius, max_height=35, carr_freq=12e3, interference_type=None)
-        x_BS = R * math.cos(math.radians(lat_BS)) * math.cos(math.radians(lon_BS))
-        y_BS = R * math.cos(math.radians(lat_BS)) * math.sin(math.radians(lon_BS))
-        #         z_BS = R * math.sin(math.radians(lat_BS))
-        z_BS = 10
-
-        x_FSS = ctx.x_FSS
-        y_FSS = ctx.y_FSS
-        bs_ue_min_radius = ctx.bs_ue_min_radius
-        bs_ue_max_radius = ctx.bs_ue_max_radius
-
-        BS_X = np.append(BS_X, x_BS - x_FSS)
-        BS_Y = np.append(BS_Y, y_BS - y_FSS)
-        BS_Z = np.append(BS_Z, 10)
-        if output:
-            print("Bs Co-ordinates=" + str(x_BS) + "," + str(y_BS) + "," + str(z_BS))
-
+    lat_BS = np.radians(np.asarray(data_within_zone["latitude"].iloc[:base_station_count], dtype=float))
+    lon_BS = np.radians(np.asarray(data_within_zone["longitude"].iloc[:base_station_count], dtype=float))
+    BS_X = R * np.cos(lat_BS) * np.cos(lon_BS) - ctx.x_FSS
+    BS_Y = R * np.cos(lat_BS) * np.sin(lon_BS) - ctx.y_FSS
+    BS_Z = np.full(len(BS_X), 10.0)
     if output:
         print(BS_X, BS_Y, BS_Z)
 
-    # Create user equipment
-    UE_X = np.array([])
-    UE_Y = np.array([])
-    UE_Z = np.array([])
-    UE_CHANNEL = np.array([])
-    for p in range(len(BS_X)):
-        for i in range(3):
-            # number of split regions
-            # i is the sector number
-            for j in range(10):
-                # number of UEs per region
-                # j is the number of the UE in one sector
-                bs_x, bs_y, bs_z = BS_X[p], BS_Y[p], BS_Z[p]
-                theta_bs_ue = random.uniform(120 * i, 120 * (i + 1))
-                # 0-120, 120-240, 240-360
-                radius_bs_ue = random.uniform(bs_ue_min_radius, bs_ue_max_radius)
-
-                x1 = bs_x + radius_bs_ue * math.cos(math.radians(theta_bs_ue))
-                y1 = bs_y + radius_bs_ue * math.sin(math.radians(theta_bs_ue))
-
-                UE_X = np.append(UE_X, x1)
-                UE_Y = np.append(UE_Y, y1)
-                UE_Z = np.append(UE_Z, 1.5)
-
-                maximum_UEs_per_channel = 4
-
-                if j > maximum_UEs_per_channel * BS_Channels.channel_count:
-                    raise Exception(f"BS cannot support {j} UEs")
-
-                count = {i: 0 for i in range(1, BS_Channels.channel_count + 1)}
-
-                channel = random.randint(1, BS_Channels.channel_count)
-
-                while count[channel] >= maximum_UEs_per_channel:
-                    channel = random.randint(1, BS_Channels.channel_count)
-
-                count[channel] += 1
-
-                UE_CHANNEL = np.append(UE_CHANNEL, channel)
-
-                if output:
-                    print(
-                        "UE Co-ordinates="
-                        + str(x1)
-                        + ","
-                        + str(y1)
-                        + ", channel: "
-                        + str(channel)
-                    )
-            if output:
-                print(UE_X, UE_Y, UE_Z)
-
-    pathloss_UMa = np.empty([0])
-    pathloss_UMi = np.empty([0])
-    pathloss_RMa = np.empty([0])
-    distance_UMa = np.empty([0])
-    distance_UMi = np.empty([0])
-    distance_RMa = np.empty([0])
-    line_of_sight = np.empty([0])
-    for i in range(len(BS_X)):
-        for j in range(len(FSS_X)):
-            pathlossumi, distance, los_single, ctx.saved_los = path_loss_UMi(
-                BS_X[i], BS_Y[i], 10, FSS_X[j], FSS_Y[j], 4.5, ctx
-            )
-            distance = data_within_zone.iloc[i]["dist_from_FSS"]
-            pathlossuma = []
-            pathlossrma = []
-            # pathlossuma, distance, los_single = path_loss_UMa(
-            #     BS_X[i], BS_Y[i], 25, FSS_X[j], FSS_Y[j], FSS_Z[j], ctx
-            # )
-            # pathlossrma, distance, los_single = path_loss_RMa(
-            #     BS_X[i], BS_Y[i], 35, FSS_X[j], FSS_Y[j], FSS_Z[j], ctx
-            # )
-            if output:
-                print(
-                    "pathloss umi:",
-                    pathlossumi,
-                    "uma:",
-                    pathlossuma,
-                    "rma:",
-                    pathlossrma,
-                    "for distance",
-                    distance,
-                )
-
-            pathloss_UMa = np.append(pathloss_UMa, pathlossuma)
-            distance_UMa = np.append(distance_UMa, distance)
-            pathloss_UMi = np.append(pathloss_UMi, pathlossumi)
-            distance_UMi = np.append(distance_UMi, distance)
-            pathloss_RMa = np.append(pathloss_RMa, pathlossrma)
-            distance_RMa = np.append(distance_RMa, distance)
-
-            line_of_sight = np.append(line_of_sight, los_single)
-
+    # the scenarios only differ by the BS height, batched engines test every BS to FSS link of all the
+    # scenarios against the walls in one call
+    scenarios = getattr(ctx, "scenarios", ("UMi",))
+    heights = [pathloss.BS_HEIGHTS[scenario] for scenario in scenarios]
+    crossings = scenario_crossings(BS_X, BS_Y, heights, FSS_X, FSS_Y, 4.5, ctx)
+    if crossings is None:
+        crossings = np.array([
+            [[link_crossings(BS_X[i], BS_Y[i], h, FSS_X[j], FSS_Y[j], 4.5, ctx) for j in range(len(FSS_X))]
+             for i in range(len(BS_X))]
+            for h in heights
+        ], dtype=int).reshape(len(heights), len(BS_X), len(FSS_X))
+    crossings = dict(zip(scenarios, crossings))
+    path_losses = {
+        scenario: pathloss.scenario_path_loss(
+            scenario, BS_X[:, None], BS_Y[:, None], pathloss.BS_HEIGHTS[scenario], FSS_X[None, :], FSS_Y[None, :],
+            4.5, crossings[scenario], ctx.rain_attenuation, link_penetration_loss(ctx),
+        )[0].ravel()
+        for scenario in scenarios
+    }
+    distances = np.repeat(np.asarray(data_within_zone["dist_from_FSS"].iloc[:len(BS_X)], dtype=float), len(FSS_X))
+    line_of_sight = (crossings[scenarios[0]] == 0).ravel().astype(float)
     if output:
-        print(pathloss_UMi, distance_UMi)
+        for k in range(len(distances)):
+            print(
+                *[f"pathloss {scenario.lower()}: {path_losses[scenario][k]}" for scenario in scenarios],
+                "for distance", distances[k],
+            )
+    return StaticLinks(FSS_X, FSS_Y, FSS_Z, BS_X, BS_Y, BS_Z, crossings, path_losses, distances, line_of_sight)
+
+
+# Random draws of count drops from rng, each array with a leading drop axis: the status of the channels of
+# every FSS, of shape (drops, FSS, FSS channels) with 1 for the channels in use, the UEs of every BS sector
+# (see ue_drop.drop_ues) of shape (drops, UEs) and the 30 UEs sampled among all the UEs for each BS to FSS
+# link, of shape (drops, BS, FSS, 30). The BS serves the sampled UEs on a channel which interferes with
+# the FSS.
+def draw_drops(rng, count, links, ctx) -> tuple:
+    channel_status = rng.integers(0, 1, size=(count, len(links.FSS_X), FSS_Channels.channel_count), endpoint=True)
+    ues = ue_drop.drop_ues(
+        rng, links.BS_X, links.BS_Y, ctx.bs_ue_min_radius, ctx.bs_ue_max_radius, BS_Channels.channel_count,
+        getattr(ctx, "sectors", ue_drop.SECTORS), getattr(ctx, "ues_per_sector", ue_drop.UES_PER_SECTOR),
+        drops=count,
+    )
+    served = min(30, ues.shape[1])
+    samples = ue_drop.sample_ues(rng, (count, len(links.BS_X), len(links.FSS_X)), ues.shape[1], served)
+    return channel_status, ues, samples
+
+
+# One Monte Carlo drop: FSS channels, UEs and the interference of the BS serving them, over the links of
+# the static phase (computed here when not given) and the random draws of a drop of draw_drops (drawn
+# here from rng when not given)
+def simulate(output=True, ctx=None, links=None, out=None, rng=None, draws=None):
+    if rng is None:
+        rng = ctx.rng
+    if links is None:
+        links = static_links(output, ctx)
+    if out is None:
+        out = results.SimulationResults(1, len(links.BS_X), len(links.FSS_X)).drop(0)
+    FSS_phi = ctx.FSS_phi
+    Noise_W = ctx.Noise_W
+    scenarios = getattr(ctx, "scenarios", ("UMi",))
+    FSS_X, FSS_Y, FSS_Z = links.FSS_X, links.FSS_Y, links.FSS_Z
+    BS_X, BS_Y, BS_Z = links.BS_X, links.BS_Y, links.BS_Z
+    path_losses = links.path_losses
+
+    if draws is None:
+        draws = tuple(draw[0] for draw in draw_drops(rng, 1, links, ctx))
+    channel_status, ues, samples = draws
+    FSS_CHANNELS = [np.flatnonzero(status) for status in channel_status]
     if output:
-        print(pathloss_UMa, distance_UMa)
+        for channels_used in FSS_CHANNELS:
+            print("FSS channel: " + str(channels_used))
+    UE_X, UE_Y, UE_Z, UE_CHANNEL = ues["x"], ues["y"], ues["z"], ues["channel"]
     if output:
-        print(pathloss_RMa, distance_RMa)
-
-    interface_UMi_W = np.empty([0])
-    interface_UMa_W = np.empty([0])
-    interface_RMa_W = np.empty([0])
-    for i in range(len(BS_X)):
-        interface_UMi_BS = np.empty([0])
-        interface_UMa_BS = np.empty([0])
-        interface_RMa_BS = np.empty([0])
-        for j in range(len(FSS_X)):
-            if output:
-                print(f"BS {i}, FSS {j}, pathloss {pathloss_UMi[i * len(FSS_X) + j]}")
-            for k in random.sample(range(len(UE_X)), 30):
-                # print(f"UE{k}")
-                # channel check
-                # if UE is using channel 1, the start is 12.2GHz and the end is 12.3GHz
-                bs_channel_start, bs_channel_end = BS_Channels.getChannelRange(
-                    UE_CHANNEL[k]
-                )
-                bs_channel_range = range(
-                    bs_channel_start, int(bs_channel_end + (5e6)), int(5e6)
-                )
-
-                interference_found = False
-
-                for fss_channel in FSS_CHANNELS[j]:
-                    # if fss_channel >= 6:
-                    fss_channel_start, fss_channel_end = FSS_Channels.getChannelRange(
-                        fss_channel
-                    )
-                    fss_channel_range = range(
-                        bs_channel_start, int(bs_channel_end + (5e6)), int(5e6)
-                    )
-
-                    bs_set = set(bs_channel_range)
-                    if len(bs_set.intersection(fss_channel_range)):
-                        interference_found = True
-
-                if not interference_found:
-                    continue
-
-                for interference_type in ["UMi", "UMa", "RMa"]:
-                    if interference_type == "UMi":
-                        BS_Z = np.array([10 for i in range(len(BS_X))])
-                    elif interference_type == "UMa":
-                        BS_Z = np.array([25 for i in range(len(BS_X))])
-                    elif interference_type == "RMa":
-                        BS_Z = np.array([35 for i in range(len(BS_X))])
-                    # bs_ue_x, bs_ue_y, bs_ue_z = BS_X-UE_X, BS_Y-UE_Y, BS_Z-UE_Z
-                    bs_ue_x, bs_ue_y, bs_ue_z = (
-                        UE_X[k] - BS_X[i],
-                        UE_Y[k] - BS_Y[i],
-                        UE_Z[k] - BS_Z[i],
-                    )
-
-                    theta_bs_ue = np.arctan(bs_ue_y / bs_ue_x)
-                    phi_bs_ue = np.sqrt(bs_ue_x ** 2 + bs_ue_y ** 2) / bs_ue_z
-
-                    theta_bs_ue = np.degrees(theta_bs_ue) % 360
-                    phi_bs_ue = np.degrees(phi_bs_ue) % 360
-                    if output:
-                        print("theta_bs_ue:", theta_bs_ue, "phi_bs_ue:", phi_bs_ue)
-
-                    theta_tilt, phi_scan = max_gain_5g_parameters(
-                        theta_bs_ue, phi_bs_ue, ctx
-                    )
-                    theta_tilt = 10
-
-                    if interference_type == "UMi":
-                        interfaceumi, pathloss_UMi_x = Interface_UMi_1(
-                            BS_X[i],
-                            BS_Y[i],
-                            BS_Z[i],
-                            FSS_X[j],
-                            FSS_Y[j],
-                            FSS_Z[j],
-                            FSS_phi['UMi'],
-                            pathloss_UMi[i * len(FSS_X) + j],
-                            theta_tilt,
-                            phi_scan,
-                        )
-                        if output:
-                            print("UE:", k, "/ interference umi:", interfaceumi, "/ pathloss:", pathlossumi)
-                        # if output:
-                        #     print(
-                        #         "interference umi:",
-                        #         interfaceumi,
-                        #         "pathloss:",
-                        #         pathlossumi,
-                        #     )
-                        interface_UMi_BS = np.append(interface_UMi_BS, interfaceumi)
-                    # elif interference_type == "UMa":
-                    #     interfaceuma, pathloss_UMa_x = Interface_UMa_1(
-                    #         BS_X[i],
-                    #         BS_Y[i],
-                    #         BS_Z[i],
-                    #         FSS_X[j],
-                    #         FSS_Y[j],
-                    #         FSS_Z[j],
-                    #         FSS_phi["UMa"],
-                    #         pathloss_UMa[i * len(FSS_X) + j],
-                    #         theta_tilt,
-                    #         phi_scan,
-                    #     )
-                    #     if output:
-                    #         print(
-                    #             "interference uma:",
-                    #             interfaceuma,
-                    #             "pathloss:",
-                    #             pathlossuma,
-                    #         )
-                    #     interface_UMa_BS = np.append(interface_UMa_BS, interfaceuma)
-                    # elif interference_type == "RMa":
-                    #     interfacerma, pathloss_RMa_x = Interface_RMa_1(
-                    #         BS_X[i],
-                    #         BS_Y[i],
-                    #         BS_Z[i],
-                    #         FSS_X[j],
-                    #         FSS_Y[j],
-                    #         FSS_Z[j],
-                    #         FSS_phi["RMa"],
-                    #         pathloss_RMa[i * len(FSS_X) + j],
-                    #         theta_tilt,
-                    #         phi_scan,
-                    #     )
-                    #     if output:
-                    #         print(
-                    #             "interference rma:",
-                    #             interfacerma,
-                    #             "pathloss:",
-                    #             pathlossrma,
-                    #         )
-                    #     interface_RMa_BS = np.append(interface_RMa_BS, interfacerma)
-        interface_UMi_W = np.append(
-            interface_UMi_W, np.sum(10 ** (interface_UMi_BS / 10))
-        )
-        interface_UMa_W = np.append(
-            interface_UMa_W, np.sum(10 ** (interface_UMa_BS / 10))
-        )
-        interface_RMa_W = np.append(
-            interface_RMa_W, np.sum(10 ** (interface_RMa_BS / 10))
-        )
+        for ue in ues:
+            print("UE Co-ordinates=" + str(ue["x"]) + "," + str(ue["y"]) + ", channel: " + str(ue["channel"]))
+        print(UE_X, UE_Y, UE_Z)
+
+    # gain of the interference of the sampled UEs, 0 for those on a channel which does not overlap the FSS
+    fractional = getattr(ctx, "channel_overlap", "boolean") == "fractional"
+    gate = np.stack(
+        [ctx.channel_plan.gate(UE_CHANNEL[samples[:, j]], FSS_CHANNELS[j], fractional) for j in range(len(FSS_X))],
+        axis=1,
+    )
 
-    if output:
-        print(interface_UMi_W, pathloss_UMi)
-    if output:
-        print(interface_UMa_W, pathloss_UMa)
-    if output:
-        print(interface_RMa_W, pathloss_RMa)
+    # interference (mW) of every BS at the FSS, summed over the UEs it serves, for each scenario
+    interface_W = {}
+    for interference_type in scenarios:
+        BS_Z = np.full(len(BS_X), pathloss.BS_HEIGHTS[interference_type], dtype=float)
+        path_loss = path_losses[interference_type].reshape(len(BS_X), len(FSS_X))
+        interface_W[interference_type] = np.zeros(len(BS_X))
+        for j in range(len(FSS_X)):
+            _, interface_mW = interference.interference(
+                BS_X[:, None], BS_Y[:, None], BS_Z[:, None],
+                UE_X[samples[:, j]], UE_Y[samples[:, j]], UE_Z[samples[:, j]],
+                FSS_X[j], FSS_Y[j], FSS_Z[j], FSS_phi[interference_type], path_loss[:, j, None],
+                lambda theta, phi: steer_beams(theta, phi, ctx),
+                lambda theta, phi, *steering: steered_gain(theta, phi, steering, ctx),
+                ctx.fss_pattern,
+            )
+            interface_W[interference_type] += np.where(gate[:, j] > 0, gate[:, j] * interface_mW, 0).sum(axis=1)
+        if output:
+            print(f"interference {interference_type}:", interface_W[interference_type])
+    interface_UMi_W = interface_W.get("UMi", np.zeros(len(BS_X)))
+    interface_UMa_W = interface_W.get("UMa", np.zeros(len(BS_X)))
+    interface_RMa_W = interface_W.get("RMa", np.zeros(len(BS_X)))
 
     # I_N_UMi = np.array([interfaceumi-Noise for interfaceumi in interface_UMi])
-    I_N_UMi = interface_UMi_W / Noise_W
+    I_N_UMi = np.divide(interface_UMi_W, Noise_W, out=out.I_N_W["UMi"])
     if output:
         print("I/N UMi:", I_N_UMi)
-    I_N_UMa = interface_UMa_W / Noise_W
+    I_N_UMa = np.divide(interface_UMa_W, Noise_W, out=out.I_N_W["UMa"])
     if output:
         print("I/N UMa:", I_N_UMa)
-    I_N_RMa = interface_RMa_W / Noise_W
+    I_N_RMa = np.divide(interface_RMa_W, Noise_W, out=out.I_N_W["RMa"])
     if output:
         print("I/N RMa:", I_N_RMa)
+    out.distance[:] = links.distances
+    out.line_of_sight[:] = links.line_of_sight
 
     return (
-        distance_RMa,
+        out.distance,
         I_N_RMa,
-        distance_UMa,
+        out.distance,
         I_N_UMa,
-        distance_UMi,
+        out.distance,
         I_N_UMi,
-        line_of_sight,
+        out.line_of_sight,
         ctx.saved_los,
     )
 
 
+# memory (bytes) drop_block sizes the blocks of drops to, and arrays of shape (drops, BS, served) the
+# interference kernel of simulate_batch holds at once
+BATCH_MEMORY = 256 * 2 ** 20
+BATCH_ARRAYS = 32
+
+
+# Drops drawn at once from one random stream by draw_drops: as many as the arrays of shape (drops, BS, served)
+# of simulate_batch fit in memory bytes. They are sized in float64 whatever the dtype, so the blocks, and the
+# drops of a seed, only depend on the request and not on the engine, the dtype or the number of workers.
+def drop_block(links, ctx, memory=BATCH_MEMORY) -> int:
+    ues_per_bs = getattr(ctx, "sectors", ue_drop.SECTORS) * getattr(ctx, "ues_per_sector", ue_drop.UES_PER_SECTOR)
+    served = min(30, len(links.BS_X) * ues_per_bs)
+    return max(1, int(memory // (len(links.BS_X) * served * np.dtype(np.float64).itemsize * BATCH_ARRAYS)))
+
+
+# Blocks of size consecutive drops out of count, as (range of the drops, seed sequence): block b draws its
+# drops from the random stream of child b of the root seed
+def drop_blocks(count, size, seed=None) -> list:
+    starts = range(0, count, size)
+    children = np.random.SeedSequence(seed).spawn(len(starts))
+    return [(range(start, min(start + size, count)), child) for start, child in zip(starts, children)]
+
+
+# Evaluate the drops of blocks (see drop_blocks) with a leading drop axis, their drops in order into the rows
+# of out. Every block is drawn at once by draw_drops as by the loop of simulate_drops, so both give the same
+# results in float64. The UE positions, channel gating, beam steering and interference sums are then evaluated
+# on arrays of shape (drops, BS, served), the blocks being sized by drop_block to fit in memory. The pointing
+# angles and the steering are always computed in float64, since float32 angles round to other cells of the
+# steering and codebook tables, and the gains and the interference in dtype: float32 stays within 1e-4 dB of
+# float64.
+def simulate_batch(ctx, links, blocks, out, dtype=np.float64):
+    BS_X, BS_Y = links.BS_X[:, None], links.BS_Y[:, None]
+    FSS_X, FSS_Y, FSS_Z = links.FSS_X, links.FSS_Y, links.FSS_Z
+    fractional = getattr(ctx, "channel_overlap", "boolean") == "fractional"
+
+    row = 0
+    for indexes, seed in blocks:
+        channel_status, ues, samples = draw_drops(np.random.default_rng(seed), len(indexes), links, ctx)
+        rows = slice(row, row + len(ues))
+        row += len(ues)
+        # (drops, FSS, BS channels) gain of the interference of the UEs on each BS channel at each FSS
+        gates = ctx.channel_plan.channel_gates(channel_status, fractional)
+        drop = np.arange(len(ues))[:, None, None]
+        for interference_type in getattr(ctx, "scenarios", ("UMi",)):
+            BS_Z = np.full((len(links.BS_X), 1), float(pathloss.BS_HEIGHTS[interference_type]))
+            path_loss = links.path_losses[interference_type].reshape(len(links.BS_X), len(links.FSS_X))
+            interface_W = np.zeros((len(ues), len(links.BS_X)))
+            for j in range(len(links.FSS_X)):
+                # (drops, BS, served) UEs each BS serves towards FSS j
+                ue = ues[drop, samples[:, :, j]]
+                gate = gates[:, j][drop, ue["channel"] - ctx.channel_plan.bs_first]
+                _, interface_mW = interference.interference(
+                    BS_X, BS_Y, BS_Z, ue["x"], ue["y"], ue["z"],
+                    FSS_X[j], FSS_Y[j], FSS_Z[j], ctx.FSS_phi[interference_type], path_loss[:, j, None],
+                    lambda theta, phi: steer_beams(theta, phi, ctx),
+                    lambda theta, phi, *steering: steered_gain(theta, phi, steering, ctx),
+                    ctx.fss_pattern, dtype,
+                )
+                interface_W += np.where(gate > 0, gate * interface_mW, 0).sum(axis=-1)
+            np.divide(interface_W, ctx.Noise_W, out=out.I_N_W[interference_type][rows])
+    out.distance[:] = links.distances
+    out.line_of_sight[:] = links.line_of_sight
+    return out
+
+
+# Evaluate the drops of blocks (see drop_blocks) one by one with simulate, their drops in order into the rows
+# of out, each block drawn at once by draw_drops
+def simulate_loop(ctx, links, blocks, out, output=False):
+    row = 0
+    for indexes, seed in blocks:
+        draws = draw_drops(np.random.default_rng(seed), len(indexes), links, ctx)
+        for k, i in enumerate(indexes):
+            simulate(output=False, ctx=ctx, links=links, out=out.drop(row), draws=tuple(draw[k] for draw in draws))
+            row += 1
+            if output:
+                print(f"The current simulation is {i} out of total {len(out.distance)}")
+    return out
+
+
+# (ctx, links, scenarios) of the request whose drops the workers of simulate_drops evaluate, inherited when
+# the pool forks
+_DROP_STATE = None
+
+
+# Evaluate the blocks of drops of a worker and return the compact results of the drops with the beam steering
+# the worker solved
+def _simulate_drops(blocks) -> tuple:
+    ctx, links, scenarios = _DROP_STATE
+    known = set(ctx.saved_tp)
+    indexes = [i for block, _ in blocks for i in block]
+    out = results.SimulationResults(len(indexes), len(links.BS_X), len(links.FSS_X), scenarios)
+    if getattr(ctx, "drop_engine", "loop") == "batched":
+        simulate_batch(ctx, links, blocks, out, ctx.drop_dtype)
+    else:
+        simulate_loop(ctx, links, blocks, out)
+    steering = {key: value for key, value in ctx.saved_tp.items() if key not in known}
+    return indexes, out, steering
+
+
+# Run the Monte Carlo drops of simulation_results in the blocks of drop_blocks, so the results of a seed do
+# not depend on the engine or on the number of workers. With more than one worker the blocks are split
+# across a pool of forked processes which return their results and the beam steering they solved, merged
+# into ctx.saved_tp. LOS is not looked up during the drops, so only the parent writes it. The drops of a
+# process are evaluated one by one by simulate, or by simulate_batch when ctx.drop_engine is "batched".
+def simulate_drops(ctx, links, simulation_results, seed=None, workers=1):
+    global _DROP_STATE
+    count = len(simulation_results.distance)
+    blocks = drop_blocks(count, drop_block(links, ctx, ctx.batch_memory), seed)
+    if workers <= 1 or len(blocks) <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        if getattr(ctx, "drop_engine", "loop") == "batched":
+            return simulate_batch(ctx, links, blocks, simulation_results, ctx.drop_dtype)
+        return simulate_loop(ctx, links, tqdm(blocks), simulation_results, output=True)
+
+    # a few chunks per worker to balance the drops which take longer
+    chunks = [chunk.tolist() for chunk in np.array_split(np.arange(len(blocks)), min(len(blocks), workers * 4))]
+    _DROP_STATE = (ctx, links, simulation_results.scenarios)
+    try:
+        with multiprocessing.get_context("fork").Pool(workers) as pool:
+            for indexes, out, steering in tqdm(
+                pool.imap_unordered(_simulate_drops, [[blocks[b] for b in chunk] for chunk in chunks]),
+                total=len(chunks),
+            ):
+                simulation_results.distance[indexes] = out.distance
+                simulation_results.line_of_sight[indexes] = out.line_of_sight
+                for scenario, I_N_W in out.I_N_W.items():
+                    simulation_results.I_N_W[scenario][indexes] = I_N_W
+                ctx.saved_tp.update(steering)
+    finally:
+        _DROP_STATE = None
+    return simulation_results
+
+
+# I/N (W) of the same links under each of the rain rates (mm/h), one row per rate. Rain adds the same
+# attenuation to the path loss of every link, so I/N computed with rain_attenuation (dB) only has to be
+# scaled by the difference of attenuation: geometry, LOS and antenna gains are not computed again.
+def rain_sweep_I_N(I_N_W, rain_attenuation, rain_rates) -> np.ndarray:
+    attenuation = pathloss.rain_attenuation(np.asarray(rain_rates, dtype=float)) - rain_attenuation
+    return np.asarray(I_N_W, dtype=float)[None, :] * 10 ** (-attenuation[:, None] / 10)
+
+
+# antenna patterns, see the vectorized patterns of the antenna module
 def gain_antenna_element_horizontal(phi) -> float:
-    phi_3db = 80  # degrees
-    front_to_back_ratio = 30  # dB
-    return -min(12 * (phi / phi_3db) ** 2, front_to_back_ratio)
+    return float(antenna.element_gain_horizontal(phi))
 
 
 # antenna vertical pattern
 def gain_antenna_element_vertical(theta) -> float:
-    theta_3db = 65  # degrees
-    side_lobe_level_limit = 30  # dB
-    return -min(12 * ((theta - 90) / theta_3db) ** 2, side_lobe_level_limit)
+    return float(antenna.element_gain_vertical(theta))
 
 
 # antenna element gain of elevation and azimuth plane
 def gain_antenna_element(theta, phi) -> float:
-    front_to_back_ratio = 30  # dB
-    antenna_gain_max = 8
-    return antenna_gain_max - min(
-        -(gain_antenna_element_horizontal(phi) + gain_antenna_element_vertical(theta)),
-        front_to_back_ratio,
-    )
+    return float(antenna.element_gain(theta, phi))
 
 
 def superposition(n, m, theta, phi, hspace, vspace) -> complex:
@@ -962,96 +830,75 @@ def weighting(n, m, theta_tilt, phi_scan, hspace, vspace, rows, cols) -> complex
     ) / cmath.sqrt(rows * cols)
 
 
-# returns theta_tilt and phi_scan which yield maximum antenna gain given theta and phi
-def max_gain_5g_parameters(theta, phi, ctx, coarse=True, rounding_precision=0) -> tuple:
+# returns theta_tilt and phi_scan which yield maximum antenna gain given theta and phi (arrays or scalars).
+# At the default steering precision of 0 decimals they come from the precomputed steering table, at finer
+# precisions (theta, phi) are rounded to ctx.steering_precision decimals and solved once per request,
+# from the analytic guess and, when there is one, the table entry
+def max_gain_5g_parameters(theta, phi, ctx) -> tuple:
+    if ctx.steering_precision == 0:
+        return ctx.steering_table.lookup(theta, phi)
     saved_tp = ctx.saved_tp
-    if coarse:
-        theta = round(theta, rounding_precision)
-        phi = round(phi, rounding_precision)
-    if (theta, phi) in saved_tp:
-        # print(f'match found for ({theta}, {phi}), using that')
-        return saved_tp.get((theta, phi))
-
-    # return max_parameters
-    # scipy's optimization can only find the minimum, so we pass a function which returns the negative of the weighting function
-    result = optimize.brute(
-        lambda x: -beam_pattern_5g(
-            theta, phi, x[0], x[1]
-        ),  # x[0] = theta_tilt, x[1] = phi_scan
-        # theta_tilt is between -90 and 90 degrees, phi_scan is between -180 and 180 degrees
-        ranges=[(-90, 90), (-180, 180)],
-    )
-    saved_tp[(theta, phi)] = tuple(x for x in result)
+    theta, phi = np.broadcast_arrays(np.round(theta, ctx.steering_precision), np.round(phi, ctx.steering_precision))
+    keys = list(zip(theta.ravel().tolist(), phi.ravel().tolist()))
+    missing = list(set(keys).difference(saved_tp))
+    if missing:
+        theta_tilt, phi_scan, _, _ = antenna.solve_steering(
+            *np.array(missing).T, ctx.steering_table, geometry=ctx.array_geometry
+        )
+        saved_tp.update(zip(missing, zip(theta_tilt.tolist(), phi_scan.tolist())))
+    steering = np.array([saved_tp[key] for key in keys]).reshape(theta.shape + (2,))
+    return steering[..., 0], steering[..., 1]
+
 
-    return saved_tp[(theta, phi)]
+# steering of the BS beams towards UEs at (theta, phi): the codebook beams with the most gain towards
+# them, else the continuous steering with theta_tilt fixed to 10 degrees
+def steer_beams(theta, phi, ctx) -> tuple:
+    if ctx.codebook is not None:
+        return (ctx.codebook.select(theta, phi),)
+    _, phi_scan = max_gain_5g_parameters(theta, phi, ctx)
+    return np.full_like(phi_scan, 10.0), phi_scan
 
 
-# a_A, the directional pattern from beam forming with an array of elements
+# gain of the BS antennas with the steering of steer_beams towards (theta, phi)
+def steered_gain(theta, phi, steering, ctx) -> np.ndarray:
+    if ctx.codebook is not None:
+        return ctx.codebook.gain(theta, phi, *steering)
+    return antenna.gain_5g(theta, phi, *steering, ctx.element_pattern, ctx.array_geometry)
+
+
+# a_A, the directional pattern from beam forming with an array of elements, see antenna.beam_pattern
 def beam_pattern_5g(theta, phi, theta_tilt, phi_scan) -> float:
-    summation = 0
-    rows = 16  # Nv
-    cols = 16  # Nh
-    hspace = 0.5  # dh/λ
-    vspace = 0.5  # dv/λ
-    # weighting multiplied by the superposition vector
-    for n in range(1, rows + 1):
-        for m in range(1, cols + 1):
-            # print(f"{theta_tilt}, {phi_scan}, {abs(weighting(n, m, theta_tilt, phi_scan, hspace, vspace))}")
-            summation += weighting(
-                n, m, theta_tilt, phi_scan, hspace, vspace, rows, cols
-            ) * superposition(n, m, theta, phi, hspace, vspace)
-
-    return abs(summation) ** 2
+    return float(antenna.beam_pattern(theta, phi, theta_tilt, phi_scan))
 
 
 # antenna gain of 5G base station (represented by a single beam i)
 def gain_5g(theta, phi, theta_tilt, phi_scan) -> float:
-    beam_pattern = beam_pattern_5g(theta, phi, theta_tilt, phi_scan)
+    return float(antenna.gain_5g(theta, phi, theta_tilt, phi_scan))
 
-    return gain_antenna_element(theta, phi) + 10 * math.log10(beam_pattern)
+
+# antenna gain of the 5G base station steered at (theta_tilt, phi_scan), or of the selected beam when the
+# base station uses a codebook
+def bs_gain(theta, phi, theta_tilt, phi_scan, codebook=None, beam=None, element_pattern=antenna.element_gain,
+            geometry=antenna.DEFAULT_ARRAY) -> float:
+    if codebook is None:
+        return float(antenna.gain_5g(theta, phi, theta_tilt, phi_scan, element_pattern, geometry))
+    return float(codebook.gain(theta, phi, beam))
 
 
 # space refers to D/λ
 def get_phi_min(space) -> float:
-    # Rec. ITU-R S.465-6
-    if space >= 50:
-        return max(1.0, 100 * (1 / space))
-    else:
-        return max(2.0, 114 * (space ** -1.09))
+    return float(antenna.fss_phi_min(space))
 
 
 # receiving antenna gain of FSS earth station
 # phi is an angle between base station antenna direction and FSS ES antenna's main axis (elevation angle)
 def gain_fss_s1428(phi, phi_min) -> float:
-    if 0 < phi < phi_min:
-        return 32 - 25 * math.log10(phi_min)
-    elif phi_min <= phi < 48:
-        return 32 - 25 * math.log10(phi)
-    elif 48 <= phi <= 180:
-        return -10
-
-    # This function is only defined where phi is within (0, 180]
-    raise ValueError(
-        f"Angle phi must be within the interval (0, 180] degrees, was {phi} degrees instead"
-    )
+    return float(antenna.fss_gain_s1428(phi, phi_min))
 
 
 # co-polarized components only
-# https://www.etsi.org/deliver/etsi_en/303900_303999/303981/01.02.01_60/en_303981v010201p.pdf
 def gain_fss_wbes_b(phi) -> float:
-    if 0 <= phi < 6:
-        return 20
-    elif 6 <= phi < 48:
-        return 40 - 25 * math.log10(phi)
-    elif 48 <= phi <= 180:
-        return -2
-    elif 180 <= phi <= 360:
-        return gain_fss_wbes_b(360 - phi)
-
-    # This function is only defined where phi is within [6, 180]
-    raise ValueError(
-        f"Angle phi must be within the interval [6, 180] degrees, was {phi} degrees instead"
-    )
+    return float(antenna.fss_gain_wbes_b(phi))
 
 
 class Building:
@@ -1258,6 +1105,44 @@ def parse_simulator_data():
     rain = json_data['rain']
     rain_rate = json_data['rain_rate']
     exclusion_zone_radius = json_data['exclusion_zone_radius']
+    # optional: "geometry3d" (default), "vectorized", "prism" or "viewshed"
+    los_engine = json_data.get('los_engine', 'geometry3d')
+    # optional: side of the viewshed raster cells in meters
+    viewshed_resolution = json_data.get('viewshed_resolution', viewshed.VIEWSHED_RESOLUTION)
+    # optional: "boolean" (default), "walls" or "buildings", penetration_loss is in dB per wall or building
+    blockage_mode = json_data.get('blockage_mode', 'boolean')
+    penetration_loss = json_data.get('penetration_loss')
+    # optional: list of rain rates (mm/h) to evaluate the same drops under, see rain_sweep_I_N
+    rain_rates = json_data.get('rain_rates')
+    # optional: deployment scenarios to evaluate, any of "UMi" (default), "UMa" and "RMa"
+    scenarios = json_data.get('scenarios', ['UMi'])
+    # optional: decimals (theta, phi) are rounded to before steering the beam, 0 (default) uses the table
+    steering_precision = json_data.get('steering_precision', 0)
+    # optional: beam codebook of the base stations, "default" or a list of [theta_tilt, phi_scan] beams
+    codebook = json_data.get('codebook')
+    # optional: antenna patterns of the FSS ("wbes_b" (default) or "s1428") and of the BS elements
+    # ("tr38901" (default) or "isotropic"), and the step (degrees) to tabulate the FSS pattern at
+    fss_pattern = json_data.get('fss_pattern', 'wbes_b')
+    element_pattern = json_data.get('element_pattern', 'tr38901')
+    pattern_step = json_data.get('pattern_step')
+    # optional: BS antenna array geometry, {"rows": 16, "cols": 16, "hspace": 0.5, "vspace": 0.5} by default
+    array_geometry = json_data.get('array_geometry')
+    # optional: sectors of every BS and UEs dropped in each sector, 3 and 10 by default
+    sectors = json_data.get('sectors', ue_drop.SECTORS)
+    ues_per_sector = json_data.get('ues_per_sector', ue_drop.UES_PER_SECTOR)
+    # optional: "boolean" (default) counts the UEs whose channel overlaps the FSS channels, "fractional"
+    # weights them by the fraction of their channel within the FSS channels
+    channel_overlap = json_data.get('channel_overlap', 'boolean')
+    # optional: root seed of the random streams of the drops, 10 by default, and processes the drops are
+    # split across, 1 (default) runs them in this process
+    seed = json_data.get('seed', 10)
+    workers = json_data.get('workers', 1)
+    # optional: "loop" (default) evaluates the drops one by one, "batched" as arrays over all the drops, and
+    # with the gains summed in float32 when float32 is true. Either way the drops are drawn in blocks whose
+    # arrays fit in batch_memory bytes
+    drop_engine = json_data.get('drop_engine', 'loop')
+    batch_memory = json_data.get('batch_memory', BATCH_MEMORY)
+    float32 = json_data.get('float32', False)
     # Parse the base station data into a list of dictionaries
     base_stations = []
     for bs_data in json_data['base_stations']:
@@ -1283,7 +1168,16 @@ def parse_simulator_data():
 
     # Run the simulator with the parsed data
     output_data = run_simulator(lat_FSS, lon_FSS, radius, simulation_count, bs_ue_max_radius, bs_ue_min_radius,
-                                base_station_count, rain, rain_rate, exclusion_zone_radius, base_stations)
+                                base_station_count, rain, rain_rate, exclusion_zone_radius, base_stations,
+                                los_engine=los_engine, blockage_mode=blockage_mode,
+                                penetration_loss=penetration_loss, viewshed_resolution=viewshed_resolution,
+                                rain_rates=rain_rates, scenarios=scenarios,
+                                steering_precision=steering_precision, codebook=codebook,
+                                fss_pattern=fss_pattern, element_pattern=element_pattern,
+                                pattern_step=pattern_step, array_geometry=array_geometry, sectors=sectors,
+                                ues_per_sector=ues_per_sector, channel_overlap=channel_overlap,
+                                seed=seed, workers=workers, drop_engine=drop_engine, batch_memory=batch_memory,
+                                float32=float32)
 
     # output_data = {
     #     "Interference_values_UMi_each_Bs": [
@@ -1339,29 +1233,21 @@ def get_plot():
     return image_html
 
 
-random.seed(10)
-
-
 def run_simulator(lat_FSS, lon_FSS, radius, simulation_count, bs_ue_max_radius, bs_ue_min_radius, base_station_count,
-                  rain, rain_rate, exclusion_zone_radius, base_stations):
+                  rain, rain_rate, exclusion_zone_radius, base_stations, los_engine="geometry3d",
+                  blockage_mode="boolean", penetration_loss=None, viewshed_resolution=viewshed.VIEWSHED_RESOLUTION,
+                  rain_rates=None, scenarios=("UMi",), steering_precision=0, codebook=None,
+                  fss_pattern="wbes_b", element_pattern="tr38901", pattern_step=None, array_geometry=None,
+                  sectors=ue_drop.SECTORS, ues_per_sector=ue_drop.UES_PER_SECTOR, channel_overlap="boolean",
+                  seed=10, workers=1, drop_engine="loop", batch_memory=BATCH_MEMORY, float32=False):
     simulator_result = {}
-    # Structure: (theta, phi) -> (theta_etilt, phi_scan)
-    saved_tp = dict()
-    saved_tp_file = Path("t0p0.pkl")
     ctx = Context()
     ctx.rain = rain
     ctx.rain_rate = rain_rate
+    # the rain coefficients only depend on the rain rate, they are computed once per request
+    ctx.rain_attenuation = pathloss.rain_attenuation(rain_rate) if rain else 0.0
     ctx.lat_FSS = lat_FSS
     ctx.lon_FSS = lon_FSS
-    if saved_tp_file.is_file():
-        with open(saved_tp_file, "rb") as f:
-            saved_tp = pickle.load(f)
-    # Structure: (segment, polygon) -> (boolean True or False)
-    saved_los = dict()
-    saved_los_file = Path("los.pkl")
-    if saved_los_file.is_file():
-        with open(saved_los_file, "rb") as f:
-            saved_los = pickle.load(f)
     data_within_zone = pd.DataFrame(base_stations)
     R = 6.371e6  # Radius of the earth
 
@@ -1391,9 +1277,6 @@ def run_simulator(lat_FSS, lon_FSS, radius, simulation_count, bs_ue_max_radius,
     #
     # data_within_zone.head(10)
     # len(data_within_zone)
-    with open("data/export (1).geojson") as f:
-        df = json.load(f)
-        data1 = pd.json_normalize(df, record_path=["features"])
     # data1.head(10)
     # data1[data1["properties.height"].notnull()].head(20)
     # data1["geometry.coordinates"].head(10)
@@ -1425,23 +1308,36 @@ def run_simulator(lat_FSS, lon_FSS, radius, simulation_count, bs_ue_max_radius,
     #         except:
     #             print(f"Skipping building {i}")
 
-    buildings = []
-    if os.path.isfile("buildings.pkl"):
-        with open('buildings.pkl', 'rb') as file:
-            buildings = pickle.load(file)
-    else:
-        for i in tqdm(range(len(data1))):
-            for coords in data1.iloc[i]["geometry.coordinates"]:
-                try:
-                    buildings.append(Building(coords, data1.iloc[i]["properties.height"], lat_FSS, lon_FSS))
-                    print(f"created building {i}")
-                except:
-                    print(f"Skipping building {i}")
-        with open("buildings.pkl", "wb") as file:
-            pickle.dump(buildings, file)
+    geojson_path = "data/export (1).geojson"
+    # buildings are preprocessed once into geographic tiles shared by every FSS site, the GeoJSON is only
+    # parsed again when it changes
+    if not building_store.is_tile_cache("building_tiles", geojson_path):
+        count, skipped = building_store.ingest_geojson(geojson_path, "building_tiles")
+        print(f"Stored {count} buildings, skipped {skipped} malformed footprints")
+    # buildings beyond the farthest link endpoint can never block a link
+    cull_radius = max([radius, *data_within_zone.get("dist_from_FSS", [])])
+    buildings = building_store.load_buildings("building_tiles", lat_FSS, lon_FSS, cull_radius)
 
     ctx.buildings = buildings
-    ctx.saved_los = saved_los
+    ctx.building_index = blockage.BuildingIndex(buildings.bounds, radius=cull_radius)
+    ctx.los_engine = los_engine
+    unknown_scenarios = set(scenarios) - set(pathloss.BS_HEIGHTS)
+    if unknown_scenarios or not scenarios:
+        raise ValueError(f"Deployment scenarios must be some of {list(pathloss.BS_HEIGHTS)}, got {list(scenarios)}")
+    ctx.scenarios = tuple(scenarios)
+    ctx.blockage_mode = blockage_mode
+    if penetration_loss is None:
+        # a link crossing a building goes through two of its external walls
+        penetration_loss = blockage.wall_penetration_loss() * (2 if blockage_mode == "buildings" else 1)
+    ctx.penetration_loss = penetration_loss
+    # Structure: (BS point, FSS point, building id, wall id) -> (boolean True or False), building ids of the
+    # tile cache, whose rows are only dropped when the tiles are ingested from another GeoJSON
+    ctx.saved_los = blockage.open_los_store("los.sqlite", building_store.tiles_fingerprint("building_tiles"))
+    if los_engine == "viewshed":
+        ctx.viewshed = viewshed.open_viewshed(
+            "viewshed", lat_FSS, lon_FSS, buildings, cull_radius, viewshed_resolution, observer_height=4.5,
+            fingerprint=blockage.buildings_fingerprint(buildings.bounds, buildings.heights),
+        )
     ctx.radius = radius
     ctx.R = R
     k = 1.38064852 * 10 ** (-23)
@@ -1455,13 +1351,50 @@ def run_simulator(lat_FSS, lon_FSS, radius, simulation_count, bs_ue_max_radius,
     ctx.base_station_count = base_station_count
     ctx.bs_ue_min_radius = bs_ue_min_radius
     ctx.bs_ue_max_radius = bs_ue_max_radius
+    ctx.sectors = sectors
+    ctx.ues_per_sector = ues_per_sector
+    # overlap of every BS channel with every FSS channel
+    ctx.channel_plan = channel_plan.ChannelPlan.from_channels(BS_Channels, FSS_Channels)
+    ctx.channel_overlap = channel_overlap
+    # random stream of drops simulated outside of simulate_drops
+    ctx.rng = np.random.default_rng(seed)
+    # engine of the drops, see simulate_drops, and memory (bytes) and precision of the batched engine
+    ctx.drop_engine = drop_engine
+    ctx.batch_memory = batch_memory
+    ctx.drop_dtype = np.float32 if float32 else np.float64
     ctx.Noise_W = Noise_W
     x, y, z = 0, 0, 4.5
     ctx.x = x
     ctx.y = y
     ctx.z = z
     ctx.data_within_zone = data_within_zone
-    ctx.saved_tp = saved_tp
+    ctx.steering_precision = steering_precision
+    # rows, cols, hspace and vspace of the BS antenna array, 16x16 spaced half a wavelength apart by default
+    ctx.array_geometry = antenna.ArrayGeometry(**(array_geometry or {}))
+    # Structure: (theta, phi) -> (theta_tilt, phi_scan), steering solved during this request
+    ctx.saved_tp = dict()
+    # steering table of the geometry, built offline with python antenna.py. Finer steering precisions are solved
+    # without it when the geometry has none
+    try:
+        ctx.steering_table = antenna.open_steering_table(ctx.array_geometry)
+    except FileNotFoundError:
+        if steering_precision == 0:
+            raise
+        ctx.steering_table = None
+    # None steers every beam continuously, "default" uses antenna.dft_codebook, else a list of beams
+    # [theta_tilt, phi_scan]
+    if codebook is None:
+        ctx.codebook = None
+    else:
+        ctx.codebook = antenna.open_codebook(
+            "codebook", antenna.dft_codebook() if codebook == "default" else codebook, element_pattern,
+            ctx.array_geometry,
+        )
+    # antenna patterns by name, the FSS pattern tabulated every pattern_step degrees when given
+    ctx.element_pattern = antenna.get_pattern(antenna.ELEMENT_PATTERNS, element_pattern)
+    ctx.fss_pattern = antenna.get_pattern(antenna.FSS_PATTERNS, fss_pattern)
+    if pattern_step is not None:
+        ctx.fss_pattern = antenna.SampledPattern(ctx.fss_pattern, pattern_step)
     FSS_phi = {"UMi": 15, "UMa": 48, "RMa": 5}
     ctx.FSS_phi = FSS_phi
     # Prototype functions to calculate antenna gain of 5G base station and FSS earth station
@@ -1471,74 +1404,39 @@ def run_simulator(lat_FSS, lon_FSS, radius, simulation_count, bs_ue_max_radius,
 
     # antenna horizontal pattern
 
-    (
-        distance_RMa,
-        I_N_RMa_W,
-        I_N_RMa_noAverage,
-        distance_UMa,
-        I_N_UMa_W,
-        I_N_UMa_noAverage,
-        distance_UMi,
-        I_N_UMi_W,
-        I_N_UMi_noAverage,
-        line_of_sight,
-    ) = [np.empty([0]) for x in range(10)]
     # simulation_count = 1
-    for i in tqdm(range(simulation_count)):
-        (
-            distance_RMa_single,
-            I_N_RMa_single_W,
-            distance_UMa_single,
-            I_N_UMa_single_W,
-            distance_UMi_single,
-            I_N_UMi_single_W,
-            line_of_sight_single,
-            saved_los,
-        ) = simulate(output=False, ctx=ctx)
-        print(f"The current simulation is {i} out of total {simulation_count}")
-
-        distance_RMa = np.append(distance_RMa, distance_RMa_single)
-        # print(I_N_RMa_single_W)
-        I_N_RMa_W = np.append(I_N_RMa_W, I_N_RMa_single_W)
-        I_N_RMa_noAverage = np.append(I_N_RMa_noAverage, 10 * np.log10(I_N_RMa_single_W))
-
-        distance_UMa = np.append(distance_UMa, distance_UMa_single)
-        I_N_UMa_W = np.append(I_N_UMa_W, I_N_UMa_single_W)
-        I_N_UMa_noAverage = np.append(I_N_UMa_noAverage, 10 * np.log10(I_N_UMa_single_W))
-
-        distance_UMi = np.append(distance_UMi, distance_UMi_single)
-        I_N_UMi_W = np.append(I_N_UMi_W, I_N_UMi_single_W)
-        I_N_UMi_noAverage = np.append(I_N_UMi_noAverage, 10 * np.log10(I_N_UMi_single_W))
-
-        line_of_sight = np.append(line_of_sight, line_of_sight_single)
-
-    for arr in (I_N_RMa_noAverage, I_N_UMa_noAverage, I_N_UMi_noAverage):
-        arr[arr == -np.inf] = 0
-
-    I_N_RMa = 10 * np.log10(np.average(I_N_RMa_W))
-    I_N_UMa = 10 * np.log10(np.average(I_N_UMa_W))
-    I_N_UMi = 10 * np.log10(np.average(I_N_UMi_W))
+    links = static_links(output=False, ctx=ctx)
+    simulation_results = results.SimulationResults(
+        simulation_count, len(links.BS_X), len(links.FSS_X), ctx.scenarios
+    )
+    simulate_drops(ctx, links, simulation_results, seed, workers)
+
+    distance = simulation_results.distance.ravel()
+    line_of_sight = simulation_results.line_of_sight.ravel()
+    I_N_UMi_W = simulation_results.I_N_W["UMi"].ravel()
 
     pairs = {
-        'RMa': (np.average(distance_RMa), I_N_RMa),
-        'UMa': (np.average(distance_UMa), I_N_UMa),
-        'UMi': (np.average(distance_UMi), I_N_UMi),
+        scenario: (np.average(distance), 10 * np.log10(np.average(simulation_results.I_N_W[scenario])))
+        for scenario in ('RMa', 'UMa', 'UMi')
     }
 
     pairs_noAverage = {
-        'RMa': (distance_RMa, I_N_RMa_noAverage),
-        'UMa': (distance_UMa, I_N_UMa_noAverage),
-        'UMi': (distance_UMi, I_N_UMi_noAverage),
+        scenario: (distance, simulation_results.I_N_dB(scenario)) for scenario in ('RMa', 'UMa', 'UMi')
     }
 
-    simulator_result["Interference_values_UMi_each_Bs"] = I_N_UMi_noAverage.tolist()
+    simulator_result.update(simulation_results.to_dict())
+    if rain_rates is not None:
+        with np.errstate(divide="ignore"):
+            I_N_UMi_sweep = 10 * np.log10(rain_sweep_I_N(I_N_UMi_W, ctx.rain_attenuation, rain_rates))
+        I_N_UMi_sweep[I_N_UMi_sweep == -np.inf] = 0
+        simulator_result["rain_sweep"] = {
+            "rain_rates": list(rain_rates),
+            "Interference_values_UMi_each_Bs": I_N_UMi_sweep.tolist(),
+        }
     # simulator_result["Interference_values_UMi"] = I_N_UMi_W.tolist()
 
     # TODO NEED TO RECHECK THE VALUES
-    with open(saved_tp_file, "wb") as f:
-        pickle.dump(saved_tp, f)
-    with open(saved_los_file, "wb") as f:
-        pickle.dump(saved_los, f)
+    ctx.saved_los.commit()
 
     # len(pairs_noAverage["RMa"][0])
     #
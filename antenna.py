@@ -0,0 +1,389 @@
+"""
+Vectorized 5G base station antenna patterns for the CCI-SWIFT ASCENT simulator
+
+Created: Oct 17, 2026
+For SWIFT-ASCENT
+"""
+
+import hashlib
+import os
+from argparse import ArgumentParser
+
+import numpy as np
+from scipy import optimize
+from tqdm import tqdm
+
+# uniform planar array of the base station
+ROWS = 16  # Nv
+COLS = 16  # Nh
+HSPACE = 0.5  # dh/λ
+VSPACE = 0.5  # dv/λ
+
+
+# Geometry of the uniform planar array of the base station. Tables derived from the beam pattern are
+# keyed by its fingerprint.
+class ArrayGeometry:
+    def __init__(self, rows=ROWS, cols=COLS, hspace=HSPACE, vspace=VSPACE):
+        self.rows = int(rows)
+        self.cols = int(cols)
+        self.hspace = float(hspace)
+        self.vspace = float(vspace)
+
+    @property
+    def fingerprint(self) -> str:
+        return f"{self.rows}x{self.cols}_{self.hspace:g}x{self.vspace:g}"
+
+    def __eq__(self, other):
+        return isinstance(other, ArrayGeometry) and self.fingerprint == other.fingerprint
+
+    def __hash__(self):
+        return hash(self.fingerprint)
+
+    def __repr__(self):
+        return f"ArrayGeometry({self.rows}, {self.cols}, {self.hspace:g}, {self.vspace:g})"
+
+
+DEFAULT_ARRAY = ArrayGeometry()
+
+
+# a_A, the directional pattern from beam forming with the array, for arrays of angles (degrees) which
+# broadcast together. The weighting of element (n, m) times its superposition vector only depends on n
+# through the row phase and on m through the column phase, so the double sum over the elements is the
+# product of a sum over the rows and a sum over the columns.
+def beam_pattern(theta, phi, theta_tilt, phi_scan, geometry=DEFAULT_ARRAY) -> np.ndarray:
+    rows, cols, hspace, vspace = geometry.rows, geometry.cols, geometry.hspace, geometry.vspace
+    theta, phi, theta_tilt, phi_scan = np.broadcast_arrays(
+        *(np.radians(np.asarray(angle, dtype=float)) for angle in (theta, phi, theta_tilt, phi_scan))
+    )
+    row_phase = vspace * (np.cos(theta) - np.sin(theta_tilt))
+    column_phase = hspace * (np.sin(theta) * np.sin(phi) - np.cos(theta_tilt) * np.sin(phi_scan))
+    # summed one element at a time, without a (..., rows) temporary
+    row_sum = sum(np.exp(2j * np.pi * row_phase * n) for n in range(rows))
+    column_sum = sum(np.exp(2j * np.pi * column_phase * m) for m in range(cols))
+    return (row_sum.real ** 2 + row_sum.imag ** 2) * (column_sum.real ** 2 + column_sum.imag ** 2) / (rows * cols)
+
+
+# Antenna patterns are vectorized functions of arrays of angles (degrees) returning gains (dBi). They are
+# registered by name, BS element patterns of (theta, phi) in ELEMENT_PATTERNS and FSS earth station
+# receive patterns of the off-axis angle phi in FSS_PATTERNS, so that requests choose them by name.
+
+# antenna element horizontal pattern
+def element_gain_horizontal(phi) -> np.ndarray:
+    phi_3db = 80  # degrees
+    front_to_back_ratio = 30  # dB
+    return -np.minimum(12 * (np.asarray(phi, dtype=float) / phi_3db) ** 2, front_to_back_ratio)
+
+
+# antenna element vertical pattern
+def element_gain_vertical(theta) -> np.ndarray:
+    theta_3db = 65  # degrees
+    side_lobe_level_limit = 30  # dB
+    return -np.minimum(12 * ((np.asarray(theta, dtype=float) - 90) / theta_3db) ** 2, side_lobe_level_limit)
+
+
+# antenna element gain of elevation and azimuth plane, 3GPP TR 38.901
+def element_gain(theta, phi) -> np.ndarray:
+    front_to_back_ratio = 30  # dB
+    antenna_gain_max = 8
+    return antenna_gain_max - np.minimum(
+        -(element_gain_horizontal(phi) + element_gain_vertical(theta)), front_to_back_ratio
+    )
+
+
+# isotropic antenna element
+def isotropic_element_gain(theta, phi) -> np.ndarray:
+    return np.zeros(np.broadcast(np.asarray(theta), np.asarray(phi)).shape)
+
+
+# antenna gain (dBi) of the 5G base station (represented by a single beam i), with an array of geometry
+# whose elements have the pattern element
+def gain_5g(theta, phi, theta_tilt, phi_scan, element=element_gain, geometry=DEFAULT_ARRAY) -> np.ndarray:
+    return element(theta, phi) + 10 * np.log10(beam_pattern(theta, phi, theta_tilt, phi_scan, geometry))
+
+
+# space refers to D/λ, Rec. ITU-R S.465-6
+def fss_phi_min(space) -> np.ndarray:
+    space = np.asarray(space, dtype=float)
+    return np.where(space >= 50, np.maximum(1.0, 100 / space), np.maximum(2.0, 114 * space ** -1.09))
+
+
+# receiving antenna gain of FSS earth station, Rec. ITU-R S.1428, phi_min of a D/λ = 50 dish by default.
+# phi is the angle between the base station direction and the FSS ES antenna's main axis, angles above
+# 180 degrees are measured the other way round.
+def fss_gain_s1428(phi, phi_min=2.0) -> np.ndarray:
+    phi = _off_axis_angle(phi)
+    with np.errstate(divide="ignore"):
+        return np.select(
+            [phi < phi_min, phi < 48], [32 - 25 * np.log10(phi_min), 32 - 25 * np.log10(phi)], -10.0
+        )
+
+
+# receiving antenna gain of FSS earth station, co-polarized components only, ETSI EN 303 981 WBES
+# class B. Angles above 180 degrees are measured the other way round.
+# https://www.etsi.org/deliver/etsi_en/303900_303999/303981/01.02.01_60/en_303981v010201p.pdf
+def fss_gain_wbes_b(phi) -> np.ndarray:
+    phi = _off_axis_angle(phi)
+    with np.errstate(divide="ignore"):
+        return np.select([phi < 6, phi < 48], [20.0, 40 - 25 * np.log10(phi)], -2.0)
+
+
+ELEMENT_PATTERNS = {"tr38901": element_gain, "isotropic": isotropic_element_gain}
+FSS_PATTERNS = {"wbes_b": fss_gain_wbes_b, "s1428": fss_gain_s1428}
+
+
+# the pattern registered as name in patterns (ELEMENT_PATTERNS or FSS_PATTERNS)
+def get_pattern(patterns, name):
+    if name not in patterns:
+        raise ValueError(f"Unknown antenna pattern {name!r}, expected one of {sorted(patterns)}")
+    return patterns[name]
+
+
+# Pattern of one angle tabulated every step degrees over [0, 360] once, then linearly interpolated.
+# Steps around the discontinuities of the pattern are smoothed over one step.
+class SampledPattern:
+    def __init__(self, pattern, step=0.01):
+        self.angles = np.linspace(0, 360, int(round(360 / step)) + 1)
+        self.gains = np.asarray(pattern(self.angles), dtype=float)
+
+    def __call__(self, angle) -> np.ndarray:
+        angle = np.asarray(angle, dtype=float)
+        if np.any((angle < 0) | (angle > 360)):
+            raise ValueError(f"Angle must be within the interval [0, 360] degrees, was {angle} degrees instead")
+        return np.interp(angle, self.angles, self.gains)
+
+
+# off-axis angles within [0, 180] degrees of angles within [0, 360] degrees
+def _off_axis_angle(phi) -> np.ndarray:
+    phi = np.asarray(phi, dtype=float)
+    if np.any((phi < 0) | (phi > 360)):
+        raise ValueError(f"Angle phi must be within the interval [0, 360] degrees, was {phi} degrees instead")
+    return np.where(phi > 180, 360 - phi, phi)
+
+
+# Dense table of the steering (theta_tilt, phi_scan) maximizing the beam pattern towards every integer
+# (theta, phi) between 0 and 360 degrees, and of the 5G gain it yields. Tables are built offline once per
+# array geometry (python antenna.py) and memory-mapped, so looking the steering up is indexing and no
+# optimization runs at request time.
+STEERING_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "steering_table.npy")
+
+# search ranges (degrees) of theta_tilt and phi_scan, and size of the optimize.brute grid over them
+STEERING_RANGES = ((-90, 90), (-180, 180))
+STEERING_GRID = 20
+
+# number of (theta, phi) cells whose steering grid is evaluated at once while building the table
+STEERING_CHUNK = 256
+
+
+class SteeringTable:
+    def __init__(self, table):
+        # table[theta, phi] = (theta_tilt, phi_scan, gain)
+        self.table = table
+
+    # optimal (theta_tilt, phi_scan) towards (theta, phi), rounded to the nearest integer degrees
+    def lookup(self, theta, phi) -> tuple:
+        entry = self.table[self._index(theta), self._index(phi)]
+        return entry[..., 0], entry[..., 1]
+
+    # 5G gain (dBi) towards (theta, phi) with the optimal steering
+    def gain(self, theta, phi) -> np.ndarray:
+        return self.table[self._index(theta), self._index(phi), 2]
+
+    def _index(self, angle) -> np.ndarray:
+        return _angle_index(angle, self.table.shape[0])
+
+
+# Opens the steering table of geometry. The table of DEFAULT_ARRAY ships with the simulator, the tables
+# of other geometries are built offline once with the same solver (python antenna.py rows cols hspace
+# vspace, see steering_table_path), as a build takes minutes, and none is built at request time.
+def open_steering_table(geometry=DEFAULT_ARRAY, path="steering") -> SteeringTable:
+    file_path = steering_table_path(geometry, path)
+    if not os.path.isfile(file_path):
+        command = "python antenna.py" if geometry == DEFAULT_ARRAY else (
+            f"python antenna.py {geometry.rows} {geometry.cols} {geometry.hspace:g} {geometry.vspace:g}"
+        )
+        raise FileNotFoundError(f"No beam steering table of {geometry} at {file_path}, build it with: {command}")
+    return SteeringTable(np.load(file_path, mmap_mode="r"))
+
+
+# .npy file of the steering table of geometry: STEERING_TABLE_PATH for DEFAULT_ARRAY, else one file per
+# geometry fingerprint in the directory path
+def steering_table_path(geometry=DEFAULT_ARRAY, path="steering") -> str:
+    if geometry == DEFAULT_ARRAY:
+        return STEERING_TABLE_PATH
+    return os.path.join(path, f"steering_{geometry.fingerprint}.npy")
+
+
+# Optimal steering of every (theta, phi) of the integer grid, as optimize.brute finds it: the grid
+# stage is evaluated for STEERING_CHUNK cells at once, then polished by optimize.fmin cell by cell.
+def build_steering_table(path=STEERING_TABLE_PATH, progress=True, geometry=DEFAULT_ARRAY):
+    theta, phi = (a.ravel() for a in _angle_grid())
+    grid = np.mgrid[tuple(slice(low, high, complex(STEERING_GRID)) for low, high in STEERING_RANGES)]
+    grid = grid.reshape(2, -1)
+    table = np.empty((len(theta), 3))
+    for start in tqdm(range(0, len(theta), STEERING_CHUNK), disable=not progress):
+        cells = slice(start, start + STEERING_CHUNK)
+        pattern = beam_pattern(theta[cells, None], phi[cells, None], grid[0], grid[1], geometry)
+        best = grid[:, np.argmax(pattern, axis=1)].T
+        for i, x0 in zip(range(len(theta))[cells], best):
+            table[i, :2] = optimize.fmin(
+                lambda x: -beam_pattern(theta[i], phi[i], x[0], x[1], geometry), x0, full_output=True, disp=False
+            )[0]
+    table[:, 2] = gain_5g(theta, phi, table[:, 0], table[:, 1], geometry=geometry)
+    _save_table(path, table.reshape(361, 361, 3))
+
+
+# initial step and tolerance (degrees) of the local refinement of solve_steering
+STEERING_STEP = 0.5
+STEERING_TOLERANCE = 1e-6
+
+# moves of the compass search over (theta_tilt, phi_scan)
+_COMPASS = np.array([(1, 0), (-1, 0), (0, 1), (0, -1)])
+
+
+# Optimal steering towards arrays of (theta, phi) without optimize.brute. The initial guess points the
+# main lobe at the target, which zeroes the row and column phases of beam_pattern:
+# sin(theta_tilt) = cos(theta) and cos(theta_tilt) * sin(phi_scan) = sin(theta) * sin(phi). With
+# coarse_grid > 0 a coarse_grid x coarse_grid grid over STEERING_RANGES is searched too, and with a steering
+# table its entry at the nearest integer (theta, phi) is a candidate too: each replaces the start where it is
+# better. A compass search, vectorized over the targets, then refines the steering until its step is below
+# tolerance. Integer angles get the table entries as they are, so the solver agrees with the table. Returns
+# theta_tilt, phi_scan, the beam pattern they yield and the number of beam pattern evaluations spent on each
+# target.
+def solve_steering(theta, phi, table=None, tolerance=STEERING_TOLERANCE, geometry=DEFAULT_ARRAY,
+                   coarse_grid=0) -> tuple:
+    theta, phi = np.broadcast_arrays(np.asarray(theta, dtype=float), np.asarray(phi, dtype=float))
+    shape = theta.shape
+    theta, phi = theta.ravel(), phi.ravel()
+    pattern = lambda t, p, x: beam_pattern(t, p, x[..., 0], x[..., 1], geometry)
+
+    tilt = np.arcsin(np.clip(np.cos(np.radians(theta)), -1, 1))
+    cos_tilt = np.cos(tilt)
+    sin_scan = np.divide(np.sin(np.radians(theta)) * np.sin(np.radians(phi)), cos_tilt,
+                         out=np.zeros_like(cos_tilt), where=cos_tilt > 1e-12)
+    x = np.degrees(np.column_stack([tilt, np.arcsin(np.clip(sin_scan, -1, 1))]))
+    best = pattern(theta, phi, x)
+    evaluations = np.ones(len(theta), dtype=int)
+
+    low, high = np.array(STEERING_RANGES, dtype=float).T
+    if coarse_grid:
+        grid = np.mgrid[tuple(slice(l, h, complex(coarse_grid)) for l, h in STEERING_RANGES)]
+        grid = grid.reshape(2, -1).T
+        values = pattern(theta[:, None], phi[:, None], grid)
+        j = np.argmax(values, axis=1)
+        better = values[np.arange(len(theta)), j] > best
+        x[better], best[better] = grid[j[better]], values[better, j[better]]
+        evaluations += len(grid)
+
+    step = np.full(len(theta), STEERING_STEP)
+    if table is not None:
+        entry = np.column_stack(table.lookup(theta, phi)).astype(float)
+        value = pattern(theta, phi, entry)
+        evaluations += 1
+        integer = (theta == np.round(theta)) & (phi == np.round(phi))
+        better = (value > best) | integer
+        x[better], best[better] = entry[better], value[better]
+        step[integer] = 0.0
+    active = np.flatnonzero(step > tolerance)
+    while len(active):
+        candidates = np.clip(x[active, None] + step[active, None, None] * _COMPASS, low, high)
+        values = pattern(theta[active, None], phi[active, None], candidates)
+        evaluations[active] += len(_COMPASS)
+        j = np.argmax(values, axis=1)
+        value = values[np.arange(len(active)), j]
+        improved = value > best[active]
+        x[active[improved]] = candidates[improved, j[improved]]
+        best[active[improved]] = value[improved]
+        step[active[~improved]] /= 2
+        active = active[step[active] > tolerance]
+    return x[:, 0].reshape(shape), x[:, 1].reshape(shape), best.reshape(shape), evaluations.reshape(shape)
+
+
+# Codebook of a base station which steers its beam among a finite set of beams, with the 5G gain of every
+# beam precomputed towards every integer (theta, phi) between 0 and 360 degrees. The beam serving a UE is
+# the one with the most gain towards it in the table, and the gain of the selected beam towards the FSS is
+# evaluated at the exact angles with the element pattern and geometry of the array.
+class Codebook:
+    def __init__(self, beams, gains, element=element_gain, geometry=DEFAULT_ARRAY):
+        # beams[b] = (theta_tilt, phi_scan), gains[theta, phi, b] = 5G gain (dBi) of beam b
+        self.beams = beams
+        self.gains = gains
+        self.element = element
+        self.geometry = geometry
+
+    # index of the beam with the most gain towards (theta, phi)
+    def select(self, theta, phi) -> np.ndarray:
+        return np.argmax(self.gains[_angle_index(theta, self.gains.shape[0]), _angle_index(phi, self.gains.shape[1])],
+                         axis=-1)
+
+    # 5G gain (dBi) of beam towards (theta, phi)
+    def gain(self, theta, phi, beam) -> np.ndarray:
+        beam = self.beams[np.asarray(beam, dtype=int)]
+        with np.errstate(divide="ignore"):
+            return gain_5g(theta, phi, beam[..., 0], beam[..., 1], self.element, self.geometry)
+
+
+# DFT codebook of tilt_beams x scan_beams beams, evenly spaced in sin(theta_tilt) and sin(phi_scan)
+def dft_codebook(tilt_beams=8, scan_beams=8) -> np.ndarray:
+    tilts = np.degrees(np.arcsin(-1 + (2 * np.arange(tilt_beams) + 1) / tilt_beams))
+    scans = np.degrees(np.arcsin(-1 + (2 * np.arange(scan_beams) + 1) / scan_beams))
+    return np.array([(tilt, scan) for tilt in tilts for scan in scans])
+
+
+# (361, 361, len(beams)) float32 table of the 5G gain (dBi) of each beam over the integer (theta, phi) grid,
+# with an array of geometry whose elements have the pattern element
+def codebook_gains(beams, element=element_gain, geometry=DEFAULT_ARRAY) -> np.ndarray:
+    theta, phi = _angle_grid()
+    gains = np.empty(theta.shape + (len(beams),), dtype=np.float32)
+    with np.errstate(divide="ignore"):
+        for b, (theta_tilt, phi_scan) in enumerate(beams):
+            gains[..., b] = gain_5g(theta, phi, theta_tilt, phi_scan, element, geometry)
+    return gains
+
+
+# Opens the codebook of beams (an array of (theta_tilt, phi_scan)) with an array of geometry whose
+# elements have the ELEMENT_PATTERNS pattern element, computing its gains the first time. Gains are cached
+# in the directory path, one .npy file per geometry, set of beams and element pattern.
+def open_codebook(path, beams, element="tr38901", geometry=DEFAULT_ARRAY) -> Codebook:
+    beams = np.asarray(beams, dtype=float).reshape(-1, 2)
+    digest = hashlib.sha1(beams.tobytes() + element.encode()).hexdigest()[:16]
+    file_path = os.path.join(path, f"codebook_{geometry.fingerprint}_{len(beams)}_{digest}.npy")
+    element = get_pattern(ELEMENT_PATTERNS, element)
+    if not os.path.isfile(file_path):
+        _save_table(file_path, codebook_gains(beams, element, geometry))
+    return Codebook(beams, np.load(file_path, mmap_mode="r"), element, geometry)
+
+
+# (theta, phi) of the integer grid of the tables, both between 0 and 360 degrees
+def _angle_grid() -> tuple:
+    angles = np.arange(361.0)
+    return np.meshgrid(angles, angles, indexing="ij")
+
+
+# writes table to the .npy file path, atomically
+def _save_table(path, table):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}.npy"
+    np.save(tmp_path, table)
+    os.replace(tmp_path, path)
+
+
+# index of angles (degrees) in tables over the integer angles 0 to size - 1
+def _angle_index(angle, size) -> np.ndarray:
+    index = np.round(np.asarray(angle, dtype=float)).astype(int)
+    if np.any((index < 0) | (index >= size)):
+        raise ValueError(f"Angles must be between 0 and {size - 1} degrees")
+    return index
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Build the beam steering table of a BS antenna array geometry")
+    parser.add_argument("geometry", nargs="*", type=float, metavar="rows cols hspace vspace",
+                        help="geometry of the array, the default 16x16 array half a wavelength apart when omitted")
+    parser.add_argument("-d", "--directory", default="steering",
+                        help="directory of the tables of other geometries, relative to where the simulator runs")
+    parser.add_argument("-o", "--output", help="table file, by default where open_steering_table looks for it")
+    args = parser.parse_args()
+    if len(args.geometry) not in (0, 4):
+        parser.error("the geometry is rows cols hspace vspace")
+    geometry = ArrayGeometry(*args.geometry) if args.geometry else DEFAULT_ARRAY
+    build_steering_table(args.output or steering_table_path(geometry, args.directory), geometry=geometry)
@@ -0,0 +1,346 @@
+"""
+Line-of-sight engines for the CCI-SWIFT ASCENT simulator
+
+Created: Oct 17, 2026
+For SWIFT-ASCENT
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+
+import numpy as np
+from shapely import geometry
+
+# distance tolerance (meters) used to decide whether a segment touches a wall
+LOS_EPS = 1e-9
+
+# upper bound on the number of (segment, wall, edge) terms evaluated at once
+LOS_CHUNK_ELEMENTS = 4_000_000
+
+# walls tested per chunk while looking for the first wall blocking each segment
+LOS_FIRST_HIT_CHUNK = 512
+
+# link endpoints are rounded to this many meters in LOS store keys
+LOS_STORE_RESOLUTION = 0.01
+
+
+# Tests every segment (starts[s] -> ends[s]) against every quad, returns a (S, W) boolean matrix which is
+# True where the segment touches the quad. Matches intersection(Segment, ConvexPolygon) is not None.
+def segment_wall_hits(starts, ends, quads, eps=LOS_EPS) -> np.ndarray:
+    starts = np.atleast_2d(np.asarray(starts, dtype=float))
+    ends = np.atleast_2d(np.asarray(ends, dtype=float))
+    quads = np.asarray(quads, dtype=float)
+    hits = np.zeros((len(starts), len(quads)), dtype=bool)
+    if len(starts) == 0 or len(quads) == 0:
+        return hits
+
+    chunk = max(1, LOS_CHUNK_ELEMENTS // (4 * len(starts)))
+    for w0 in range(0, len(quads), chunk):
+        hits[:, w0:w0 + chunk] = _segment_quad_hits(starts, ends, quads[w0:w0 + chunk], eps)
+    return hits
+
+
+# Number of quads crossed by every segment (per="walls"), or number of distinct buildings they belong to
+# (per="buildings", owners gives the building of each quad). With first_hit the count stops at 1: once a
+# segment is blocked it is left out of the remaining chunks of walls.
+def count_crossings(starts, ends, quads, owners=None, per="walls", first_hit=False, eps=LOS_EPS) -> np.ndarray:
+    if per not in ("walls", "buildings"):
+        raise ValueError(f"Crossings are counted per 'walls' or per 'buildings', not per {per!r}")
+    starts = np.atleast_2d(np.asarray(starts, dtype=float))
+    ends = np.atleast_2d(np.asarray(ends, dtype=float))
+    quads = np.asarray(quads, dtype=float)
+    counts = np.zeros(len(starts), dtype=int)
+    if len(starts) == 0 or len(quads) == 0:
+        return counts
+
+    active = np.arange(len(starts))
+    hit_segments, hit_owners = [], []
+    chunk = max(1, LOS_CHUNK_ELEMENTS // (4 * len(starts)))
+    if first_hit:
+        chunk = min(chunk, LOS_FIRST_HIT_CHUNK)
+    for w0 in range(0, len(quads), chunk):
+        hits = _segment_quad_hits(starts[active], ends[active], quads[w0:w0 + chunk], eps)
+        if first_hit:
+            blocked = hits.any(axis=1)
+            counts[active[blocked]] = 1
+            active = active[~blocked]
+            if len(active) == 0:
+                break
+        elif per == "walls":
+            counts[active] += hits.sum(axis=1)
+        else:
+            segment, wall = np.nonzero(hits)
+            hit_segments.append(active[segment])
+            hit_owners.append(np.asarray(owners)[w0 + wall])
+
+    if hit_segments:
+        segment, owner = np.concatenate(hit_segments), np.concatenate(hit_owners)
+        if len(owner) == 0:
+            return counts
+        pairs = np.unique(segment * (owner.max() + 1) + owner)
+        counts = np.bincount(pairs // (owner.max() + 1), minlength=len(starts))
+    return counts
+
+
+# Penetration loss (dB) of one external wall, 3GPP TR 38.901 low-loss building model (30% glass, 70% concrete)
+def wall_penetration_loss(fc=12) -> float:
+    glass = 2 + 0.2 * fc
+    concrete = 5 + 4 * fc
+    return 5 - 10 * np.log10(0.3 * 10 ** (-glass / 10) + 0.7 * 10 ** (-concrete / 10))
+
+
+def _segment_quad_hits(starts, ends, quads, eps):
+    # plane normal of each quad and the inward normal of each of its edges (both unit length)
+    edges = np.roll(quads, -1, axis=1) - quads
+    normal = np.cross(quads[:, 1] - quads[:, 0], quads[:, 2] - quads[:, 0])
+    normal_length = np.linalg.norm(normal, axis=1)
+    degenerate = normal_length <= eps
+    normal = normal / np.where(degenerate, 1, normal_length)[:, None]
+    inward = np.cross(normal[:, None, :], edges)
+    inward_length = np.linalg.norm(inward, axis=2)
+    inward = inward / np.where(inward_length <= eps, 1, inward_length)[..., None]
+
+    direction = ends - starts
+    length = np.maximum(np.linalg.norm(direction, axis=1), eps)
+
+    # P(t) = start + t * direction crosses the plane of the quad where n.(P(t) - v0) = 0
+    offset = np.einsum("wk,wk->w", normal, quads[:, 0])[None, :] - starts @ normal.T
+    rate = direction @ normal.T
+    parallel = np.abs(rate) <= eps
+    t = offset / np.where(parallel, 1, rate)
+
+    # edge constraints c + t * g >= 0 keep P(t) inside the quad
+    c = np.einsum("wek,sk->swe", inward, starts) - np.einsum("wek,wek->we", inward, quads)[None]
+    g = np.einsum("wek,sk->swe", inward, direction)
+
+    t_tolerance = eps / length[:, None]
+    crossing = (~parallel) & (t >= -t_tolerance) & (t <= 1 + t_tolerance)
+    crossing &= np.all(c + t[..., None] * g >= -eps, axis=2)
+
+    # segments lying in the plane of the quad: clip the segment against the edges instead
+    coplanar = parallel & (np.abs(offset) <= eps)
+    if coplanar.any():
+        cc, gc = c[coplanar], g[coplanar]
+        bound = (-eps - cc) / np.where(gc == 0, 1, gc)
+        lower = np.maximum(0, np.max(np.where(gc > 0, bound, -np.inf), axis=1))
+        upper = np.minimum(1, np.min(np.where(gc < 0, bound, np.inf), axis=1))
+        inside = np.all((gc != 0) | (cc >= -eps), axis=1)
+        crossing[coplanar] = inside & (lower <= upper + t_tolerance[np.nonzero(coplanar)[0], 0])
+
+    crossing[:, degenerate] = False
+    return crossing
+
+
+# 2.5D test of the segments from start_xy raised to each of the start_heights to end, against buildings
+# given as footprints extruded from the ground up to their heights. The outline of each footprint is
+# intersected with the 2D projection of the link once for all the heights, a segment is blocked when its
+# height where it enters or leaves a footprint is within the walls. This counts the same buildings as
+# testing every wall quad of the buildings with segment_wall_hits, stopping at 1 with first_hit.
+def prism_crossings_heights(start_xy, start_heights, end, footprints, heights, first_hit=False, eps=1e-6) -> np.ndarray:
+    start_xy = np.asarray(start_xy, dtype=float)[:2]
+    start_heights = np.asarray(start_heights, dtype=float).reshape(-1, 1)
+    end = np.asarray(end, dtype=float)
+    direction = end[:2] - start_xy
+    length_squared = direction @ direction
+    if length_squared <= eps ** 2:
+        link = geometry.Point(start_xy)
+    else:
+        link = geometry.LineString([start_xy, end[:2]])
+
+    counts = np.zeros(len(start_heights), dtype=int)
+    for footprint, height in zip(footprints, heights):
+        height = float(height)
+        blocked = np.zeros(len(start_heights), dtype=bool)
+        crossing = footprint.boundary.intersection(link)
+        for part in getattr(crossing, "geoms", [crossing]):
+            if part.is_empty:
+                continue
+            if length_squared <= eps ** 2:
+                t = np.array([0.0, 1.0])
+            else:
+                t = np.clip((np.asarray(part.coords)[:, :2] - start_xy) @ direction / length_squared, 0, 1)
+            z = start_heights + t * (end[2] - start_heights)
+            blocked |= np.any((z >= -eps) & (z <= height + eps), axis=1)
+            blocked |= (z.min(axis=1) < -eps) & (z.max(axis=1) > height + eps)
+            if blocked.all():
+                break
+        counts += blocked
+        if first_hit:
+            counts = np.minimum(counts, 1)
+            if counts.all():
+                break
+    return counts
+
+
+# Uniform grid over the bounding boxes of the building footprints. Buildings which lie entirely outside
+# the inclusion radius around the FSS (the origin of the coordinates) are dropped when the index is
+# built, so queries only ever see buildings that can sit between a BS and the FSS.
+class BuildingIndex:
+    def __init__(self, bounds, radius=None, cell_size=100.0):
+        bounds = np.asarray(bounds, dtype=float).reshape(-1, 4)
+        keep = np.all(np.isfinite(bounds), axis=1)
+        if radius is not None:
+            nearest_x = np.clip(0, bounds[:, 0], bounds[:, 2])
+            nearest_y = np.clip(0, bounds[:, 1], bounds[:, 3])
+            keep &= np.hypot(nearest_x, nearest_y) <= radius
+
+        self.radius = radius
+        self.cell_size = float(cell_size)
+        self.building_ids = np.nonzero(keep)[0]
+        self.bounds = bounds[self.building_ids]
+
+        # cells covered by every bounding box, stored as a sorted (cell, building) list
+        low = np.floor(self.bounds[:, :2] / self.cell_size).astype(np.int64)
+        high = np.floor(self.bounds[:, 2:] / self.cell_size).astype(np.int64)
+        self.origin = low.min(axis=0) if len(low) else np.zeros(2, dtype=np.int64)
+        self.shape = (high.max(axis=0) - self.origin + 1) if len(high) else np.ones(2, dtype=np.int64)
+        spans = high - low + 1
+        counts = spans[:, 0] * spans[:, 1]
+        owner = np.repeat(np.arange(len(low)), counts)
+        step = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cell_x = low[owner, 0] + step % spans[owner, 0] - self.origin[0]
+        cell_y = low[owner, 1] + step // spans[owner, 0] - self.origin[1]
+        cells = cell_x * self.shape[1] + cell_y
+        order = np.argsort(cells, kind="stable")
+        self._cells = cells[order]
+        self._members = owner[order]
+
+    def __len__(self):
+        return len(self.building_ids)
+
+    # indexes (into the list the index was built from) of the buildings whose footprint bounding box is
+    # crossed by the 2D projection of the segment
+    def query_segment(self, start, end) -> np.ndarray:
+        if len(self.building_ids) == 0:
+            return self.building_ids
+        start = np.asarray(start, dtype=float)[:2]
+        end = np.asarray(end, dtype=float)[:2]
+
+        low = np.floor(np.minimum(start, end) / self.cell_size).astype(np.int64) - self.origin
+        high = np.floor(np.maximum(start, end) / self.cell_size).astype(np.int64) - self.origin
+        low = np.maximum(low, 0)
+        high = np.minimum(high, self.shape - 1)
+        if np.any(low > high):
+            return self.building_ids[:0]
+
+        grid_x, grid_y = np.meshgrid(np.arange(low[0], high[0] + 1), np.arange(low[1], high[1] + 1), indexing="ij")
+        grid_x, grid_y = grid_x.ravel(), grid_y.ravel()
+        cell_boxes = np.column_stack([
+            (grid_x + self.origin[0]) * self.cell_size,
+            (grid_y + self.origin[1]) * self.cell_size,
+            (grid_x + self.origin[0] + 1) * self.cell_size,
+            (grid_y + self.origin[1] + 1) * self.cell_size,
+        ])
+        cells = (grid_x * self.shape[1] + grid_y)[segment_crosses_boxes(start, end, cell_boxes)]
+
+        first = np.searchsorted(self._cells, cells, side="left")
+        last = np.searchsorted(self._cells, cells, side="right")
+        if not np.any(last > first):
+            return self.building_ids[:0]
+        members = np.unique(np.concatenate([self._members[a:b] for a, b in zip(first, last)]))
+        members = members[segment_crosses_boxes(start, end, self.bounds[members])]
+        return self.building_ids[members]
+
+
+# True for every (minx, miny, maxx, maxy) box touched by the 2D segment start -> end (slab test)
+def segment_crosses_boxes(start, end, boxes, eps=LOS_EPS) -> np.ndarray:
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+    start = np.asarray(start, dtype=float)[:2]
+    direction = np.asarray(end, dtype=float)[:2] - start
+    t_low = np.zeros(len(boxes))
+    t_high = np.ones(len(boxes))
+    inside = np.ones(len(boxes), dtype=bool)
+    for axis in range(2):
+        lower, upper = boxes[:, axis] - eps, boxes[:, axis + 2] + eps
+        if abs(direction[axis]) <= eps:
+            inside &= (start[axis] >= lower) & (start[axis] <= upper)
+            continue
+        t_a = (lower - start[axis]) / direction[axis]
+        t_b = (upper - start[axis]) / direction[axis]
+        t_low = np.maximum(t_low, np.minimum(t_a, t_b))
+        t_high = np.minimum(t_high, np.maximum(t_a, t_b))
+    return inside & (t_low <= t_high)
+
+
+# Persistent LOS results of single walls, stored in SQLite and looked up one key at a time. Keys are the
+# quantized absolute link endpoints plus the integer ids of the building and of the wall inside the
+# building. The store remembers a fingerprint of the building set it was filled from (the tile cache, see
+# building_store.tiles_fingerprint) and drops its rows when it is opened for a different set, since
+# building ids are only stable within one set.
+class LOSStore:
+    def __init__(self, path, fingerprint=None, resolution=LOS_STORE_RESOLUTION):
+        self.path = str(path)
+        self.resolution = resolution
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS los ("
+            "ax INTEGER, ay INTEGER, az INTEGER, bx INTEGER, by INTEGER, bz INTEGER, "
+            "building INTEGER, wall INTEGER, blocked INTEGER, "
+            "PRIMARY KEY (ax, ay, az, bx, by, bz, building, wall)) WITHOUT ROWID"
+        )
+        self._connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        if fingerprint is not None:
+            self.use_fingerprint(fingerprint)
+        self._connection.commit()
+
+    def use_fingerprint(self, fingerprint):
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM meta WHERE name = 'fingerprint'").fetchone()
+            if row is None or row[0] != fingerprint:
+                self._connection.execute("DELETE FROM los")
+                self._connection.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (fingerprint,))
+                self._connection.commit()
+
+    def key(self, start, end, building=-1, wall=-1) -> tuple:
+        endpoints = np.round(np.concatenate([np.ravel(start)[:3], np.ravel(end)[:3]]) / self.resolution)
+        return (*(int(v) for v in endpoints), int(building), int(wall))
+
+    def get(self, key, default=None):
+        row = self._connection.execute(
+            "SELECT blocked FROM los WHERE ax = ? AND ay = ? AND az = ? AND bx = ? AND by = ? AND bz = ? "
+            "AND building = ? AND wall = ?", key
+        ).fetchone()
+        return default if row is None else bool(row[0])
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __setitem__(self, key, blocked):
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO los VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", (*key, int(blocked)))
+
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM los").fetchone()[0]
+
+    # writes the results added since the last commit, never rewrites the whole store
+    def commit(self):
+        with self._lock:
+            self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.commit()
+            self._connection.close()
+
+
+_los_stores = dict()
+
+
+# LOS stores are opened once per process and shared by every request
+def open_los_store(path, fingerprint=None) -> LOSStore:
+    path = os.path.abspath(path)
+    if path not in _los_stores:
+        _los_stores[path] = LOSStore(path)
+    if fingerprint is not None:
+        _los_stores[path].use_fingerprint(fingerprint)
+    return _los_stores[path]
+
+
+# identifies a set of buildings by the bounding boxes of the footprints and the heights
+def buildings_fingerprint(bounds, heights) -> str:
+    digest = hashlib.sha1(np.ascontiguousarray(bounds, dtype=float).tobytes())
+    digest.update(np.ascontiguousarray(heights, dtype=float).tobytes())
+    return digest.hexdigest()
@@ -0,0 +1,498 @@
+"""
+Columnar building store for the CCI-SWIFT ASCENT simulator
+
+Created: Oct 17, 2026
+For SWIFT-ASCENT
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+
+import numpy as np
+from Geometry3D import ConvexPolygon, Point
+from shapely import geometry
+
+# arrays of a store, each one is saved as <name>.npy inside the store directory
+#   vertices: (V, 2) footprint rings of all the buildings (closed, relative to the FSS)
+#   offsets: (B + 1,) building b owns vertices[offsets[b]:offsets[b + 1]]
+#   heights: (B,) building heights (meters)
+#   bounds: (B, 4) footprint bounding boxes as minx, miny, maxx, maxy
+#   wall_quads, wall_owners: (W, 4, 3) walls of ring_wall_quads and their buildings
+STORE_ARRAYS = ("vertices", "offsets", "heights", "bounds", "wall_quads", "wall_owners")
+
+# size (degrees of latitude and longitude) of the tiles of ingest_geojson
+TILE_DEGREES = 0.05
+
+# seed of the heights drawn by ingest_geojson for the buildings without one
+HEIGHT_SEED = 0
+
+EARTH_RADIUS = 6.371e6
+
+
+# Writes a store from closed footprint rings (vertices split by offsets) and heights. The arrays are
+# first written to a temporary directory and renamed, so readers never see a half written store.
+def write_store_arrays(path, vertices, offsets, heights):
+    vertices = np.asarray(vertices, dtype=float).reshape(-1, 2)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    heights = np.asarray(heights, dtype=float)
+    wall_quads, wall_owners = ring_wall_quads(vertices, offsets, heights)
+    arrays = {
+        "vertices": vertices,
+        "offsets": offsets,
+        "heights": heights,
+        "bounds": ring_bounds(vertices, offsets),
+        "wall_quads": wall_quads,
+        "wall_owners": wall_owners,
+    }
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for name in STORE_ARRAYS:
+        np.save(os.path.join(tmp_path, f"{name}.npy"), arrays[name])
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+# Flattens the walls of every building into one (W, 4, 3) array of quads and a (W,) array holding the
+# index of the building each wall belongs to. The walls are the same as Building.get_wall_polygons (one
+# vertical quad per ring edge, from the ground up to the building height), built without Building objects,
+# with the vertices in cyclic order: low_1, low_2, high_2, high_1.
+def ring_wall_quads(vertices, offsets, heights) -> tuple:
+    owners = np.repeat(np.arange(len(heights)), np.diff(offsets))
+    # an edge joins vertex k to vertex k + 1 of the same ring
+    first = np.flatnonzero(owners[:-1] == owners[1:])
+    quads = np.zeros((len(first), 4, 3))
+    quads[:, 0, :2] = vertices[first]
+    quads[:, 1, :2] = vertices[first + 1]
+    quads[:, 2, :2] = vertices[first + 1]
+    quads[:, 3, :2] = vertices[first]
+    quads[:, 2:, 2] = heights[owners[first], None]
+    return quads, owners[first].astype(np.int64)
+
+
+# (B, 4) bounding boxes of the rings as minx, miny, maxx, maxy
+def ring_bounds(vertices, offsets) -> np.ndarray:
+    if len(offsets) < 2:
+        return np.zeros((0, 4))
+    starts = offsets[:-1]
+    return np.column_stack([
+        np.minimum.reduceat(vertices[:, 0], starts), np.minimum.reduceat(vertices[:, 1], starts),
+        np.maximum.reduceat(vertices[:, 0], starts), np.maximum.reduceat(vertices[:, 1], starts),
+    ])
+
+
+# Preprocesses the footprints of a GeoJSON FeatureCollection into geographic tiles which every FSS site
+# can share. Features are streamed from the file and projected batch_size rings at a time to the absolute
+# x, y of Building.latlon_to_XYZ (before the FSS offset is removed). Every ring goes to the tile_degrees
+# wide lat/lon tile of its first vertex, each tile is a store of its own in path/<tile> and path/manifest.json
+# lists the tiles with the x, y bounds of their buildings and the global id of their first building: the
+# buildings of the cache are numbered tile after tile, in the order of the tile names. Every projected batch is appended to the staging
+# files of its tiles, so the memory held is one batch while reading and one tile while writing the stores.
+# Every ring of "geometry.coordinates" is one building, with the "height" of its feature when it is a
+# number (or a numeric string), else a random height between 10 and 40 like Building, drawn in file order
+# from a generator seeded with seed so every ingest of the file gives the same heights. Rings which are not
+# a list of at least 3 distinct [lon, lat] pairs, which have repeated consecutive vertices, or which have
+# zero height are skipped. Returns the number of buildings stored and of rings skipped.
+def ingest_geojson(geojson_path, path, tile_degrees=TILE_DEGREES, batch_size=10000, seed=HEIGHT_SEED) -> tuple:
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    staging = os.path.join(tmp_path, "staging")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(staging)
+    # tile name -> number of buildings and x, y bounds of the tile
+    tiles = {}
+    batch_rings, batch_heights = [], []
+    skipped = 0
+    rng = np.random.default_rng(seed)
+
+    def flush_batch():
+        if not batch_rings:
+            return
+        lengths = np.array([len(ring) for ring in batch_rings])
+        points = np.concatenate(batch_rings)
+        xy = project_xy(points[:, 0], points[:, 1])
+        names = np.array([tile_name(ring[0, 1], ring[0, 0], tile_degrees) for ring in batch_rings])
+        ring_of_point = np.repeat(np.arange(len(batch_rings)), lengths)
+        for name in np.unique(names):
+            rings = np.flatnonzero(names == name)
+            tile_xy = xy[np.isin(ring_of_point, rings)]
+            _append(staging, name, vertices=tile_xy, lengths=lengths[rings],
+                    heights=np.asarray(batch_heights, dtype=float)[rings])
+            tile = tiles.setdefault(str(name), {"buildings": 0, "bounds": [np.inf, np.inf, -np.inf, -np.inf]})
+            tile["buildings"] += len(rings)
+            tile["bounds"] = [*np.minimum(tile["bounds"][:2], tile_xy.min(axis=0)).tolist(),
+                              *np.maximum(tile["bounds"][2:], tile_xy.max(axis=0)).tolist()]
+        batch_rings.clear()
+        batch_heights.clear()
+
+    for feature in iter_geojson_features(geojson_path):
+        try:
+            rings = feature["geometry"]["coordinates"]
+            height = (feature.get("properties") or {}).get("height")
+        except (KeyError, TypeError, AttributeError):
+            skipped += 1
+            continue
+        for coords in rings if isinstance(rings, list) else []:
+            ring_height = _footprint_height(height)
+            if ring_height is None:
+                ring_height = rng.uniform(10, 40)
+            ring = _closed_ring(coords)
+            if ring is None or ring_height <= 0:
+                skipped += 1
+                continue
+            batch_rings.append(ring)
+            batch_heights.append(ring_height)
+            if len(batch_rings) >= batch_size:
+                flush_batch()
+    flush_batch()
+
+    manifest = {"source": geojson_source(geojson_path), "tile_degrees": tile_degrees, "height_seed": seed,
+                "tiles": {}}
+    first_id = 0
+    for name in sorted(tiles):
+        vertices, lengths, heights = _read_staged(staging, name)
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(lengths)
+        write_store_arrays(os.path.join(tmp_path, name), vertices, offsets, heights)
+        manifest["tiles"][name] = {**tiles[name], "first_id": first_id}
+        first_id += tiles[name]["buildings"]
+    shutil.rmtree(staging)
+    with open(os.path.join(tmp_path, "manifest.json"), "w") as file:
+        json.dump(manifest, file)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    return sum(tile["buildings"] for tile in manifest["tiles"].values()), skipped
+
+
+# appends the (V, 2) vertices, the vertex count of each ring and the heights of a batch to the staging
+# files of tile
+def _append(staging, tile, vertices, lengths, heights):
+    for name, array, dtype in (("vertices", vertices, np.float64), ("lengths", lengths, np.int64),
+                               ("heights", heights, np.float64)):
+        with open(os.path.join(staging, f"{tile}.{name}"), "ab") as file:
+            np.ascontiguousarray(array, dtype=dtype).tofile(file)
+
+
+# vertices, ring vertex counts and heights appended to the staging files of tile, which are then removed
+def _read_staged(staging, tile) -> tuple:
+    arrays = []
+    for name, dtype in (("vertices", np.float64), ("lengths", np.int64), ("heights", np.float64)):
+        file_path = os.path.join(staging, f"{tile}.{name}")
+        arrays.append(np.fromfile(file_path, dtype=dtype))
+        os.remove(file_path)
+    return arrays[0].reshape(-1, 2), arrays[1], arrays[2]
+
+
+# True when path holds tiles ingested from the current version of the GeoJSON file with the same settings
+def is_tile_cache(path, geojson_path, tile_degrees=TILE_DEGREES, seed=HEIGHT_SEED) -> bool:
+    manifest_path = os.path.join(path, "manifest.json")
+    if not os.path.isfile(manifest_path):
+        return False
+    with open(manifest_path) as file:
+        manifest = json.load(file)
+    return (manifest["source"] == geojson_source(geojson_path) and manifest["tile_degrees"] == tile_degrees
+            and manifest.get("height_seed") == seed and all("first_id" in tile for tile in manifest["tiles"].values()))
+
+
+# Identifies the buildings of the tile cache at path, and so the global building ids of its manifest: the
+# GeoJSON file and version they were ingested from, the tile size and the seed of the missing heights
+def tiles_fingerprint(path) -> str:
+    with open(os.path.join(path, "manifest.json")) as file:
+        manifest = json.load(file)
+    identity = {name: manifest.get(name) for name in ("source", "tile_degrees", "height_seed")}
+    return hashlib.sha1(json.dumps(identity, sort_keys=True).encode()).hexdigest()
+
+
+# Opens the tiles which hold buildings closer than radius (meters, in x, y) to the FSS and returns their
+# buildings as one store relative to the FSS like Building.latlon_to_XYZ. The tiles stay memory mapped.
+def load_buildings(path, lat_FSS, lon_FSS, radius) -> "TiledBuildings":
+    with open(os.path.join(path, "manifest.json")) as file:
+        manifest = json.load(file)
+    x_FSS, y_FSS = fss_xy(lat_FSS, lon_FSS)
+    names = [
+        name for name, tile in sorted(manifest["tiles"].items())
+        if tile["bounds"][0] <= x_FSS + radius and tile["bounds"][2] >= x_FSS - radius
+        and tile["bounds"][1] <= y_FSS + radius and tile["bounds"][3] >= y_FSS - radius
+    ]
+    return TiledBuildings(
+        [BuildingStore(os.path.join(path, name)) for name in names], (x_FSS, y_FSS),
+        [manifest["tiles"][name]["first_id"] for name in names],
+    )
+
+
+# lat/lon tile holding the point, tiles are named <row>_<column>
+def tile_name(lat, lon, tile_degrees=TILE_DEGREES) -> str:
+    return f"{math.floor(lat / tile_degrees)}_{math.floor(lon / tile_degrees)}"
+
+
+# identifies the GeoJSON file and its version
+def geojson_source(geojson_path) -> dict:
+    stat = os.stat(geojson_path)
+    return {"geojson": os.path.abspath(geojson_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+# (N, 2) absolute x, y of the points, Building.latlon_to_XYZ before the FSS offset is removed
+def project_xy(lon, lat, R=EARTH_RADIUS) -> np.ndarray:
+    lon, lat = np.radians(lon), np.radians(lat)
+    return np.column_stack([R * np.cos(lat) * np.cos(lon), R * np.cos(lat) * np.sin(lon)])
+
+
+# absolute x, y of the FSS, subtracted from the projected points to make them relative to the FSS
+def fss_xy(lat_FSS, lon_FSS, R=EARTH_RADIUS) -> tuple:
+    x_FSS = R * math.cos(math.radians(lat_FSS)) * math.cos(math.radians(lon_FSS))
+    y_FSS = R * math.cos(math.radians(lat_FSS)) * math.sin(math.radians(lon_FSS))
+    return x_FSS, y_FSS
+
+
+# Yields the features of a GeoJSON FeatureCollection one at a time. Only the feature being decoded and
+# one read chunk are held in memory, whatever the size of the file.
+def iter_geojson_features(geojson_path, chunk_size=1 << 20):
+    decoder = json.JSONDecoder()
+    with open(geojson_path) as file:
+        buffer = ""
+        start = -1
+        while start < 0:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                return
+            buffer += chunk
+            match = re.search(r'"features"\s*:\s*\[', buffer)
+            if match:
+                start = match.end()
+            else:
+                # keep enough of the tail to match a key split between two chunks
+                buffer = buffer[-64:]
+        buffer = buffer[start:]
+
+        position = 0
+        read_size = chunk_size
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position < len(buffer) and buffer[position] == "]":
+                return
+            try:
+                if position == len(buffer):
+                    raise json.JSONDecodeError("end of buffer", buffer, position)
+                feature, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                chunk = file.read(read_size)
+                if not chunk:
+                    raise
+                buffer = buffer[position:] + chunk
+                position = 0
+                # a feature larger than the chunk is decoded again on every read, grow the reads
+                read_size *= 2
+                continue
+            read_size = chunk_size
+            yield feature
+
+
+# height property of a feature in meters, None when it is missing or not a finite number
+def _footprint_height(height):
+    try:
+        height = float(height)
+    except (TypeError, ValueError):
+        return None
+    return height if math.isfinite(height) else None
+
+
+# (N, 2) closed ring of [lon, lat] pairs, None when coords is not a valid footprint
+def _closed_ring(coords):
+    try:
+        ring = np.array(coords, dtype=float)
+    except (TypeError, ValueError):
+        return None
+    if ring.ndim != 2 or ring.shape[1] != 2 or not np.isfinite(ring).all():
+        return None
+    if not np.array_equal(ring[0], ring[-1]):
+        ring = np.vstack([ring, ring[:1]])
+    if len(ring) < 4 or (ring[1:] == ring[:-1]).all(axis=1).any() or len(np.unique(ring, axis=0)) < 3:
+        return None
+    return ring
+
+
+# Read only view of a store written by write_store_arrays. The arrays are memory mapped, so opening a
+# store is immediate and processes opening the same store share its pages. It behaves like a list of
+# Building objects: store[i] is a StoredBuilding, kept once it has been built.
+class BuildingStore:
+    def __init__(self, path):
+        self.path = path
+        self._buildings = {}
+        for name in STORE_ARRAYS:
+            setattr(self, name, _load_array(os.path.join(path, f"{name}.npy")))
+
+    def __len__(self):
+        return len(self.heights)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("building index out of range")
+        if i not in self._buildings:
+            self._buildings[i] = StoredBuilding(self, i)
+        return self._buildings[i]
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    # memory maps are not pickled, worker processes open the store again
+    def __reduce__(self):
+        return BuildingStore, (self.path,)
+
+    # indexes of the walls of the buildings and the building each of them belongs to
+    def walls_of(self, building_ids) -> tuple:
+        if not hasattr(self, "_wall_offsets"):
+            self._wall_offsets = np.searchsorted(self.wall_owners, np.arange(len(self) + 1))
+        return _walls_of(self._wall_offsets, building_ids)
+
+
+# Buildings of several tile stores seen as one store whose x, y are relative to the FSS at offset. The tiles
+# stay memory mapped, so processes opening the same tiles share their pages: only the arrays with one row
+# per building are gathered, vertices and wall_quads read the rows they are indexed with from the tiles and
+# move them relative to the FSS. Building i of the store is building ids[i] of the tile cache, numbered from
+# the first_ids of the tiles (from 0 when not given), which stays the same for every FSS.
+class TiledBuildings:
+    def __init__(self, tiles, offset, first_ids=None):
+        self.tiles = list(tiles)
+        self.offset = np.asarray(offset, dtype=float)
+        self._buildings = {}
+        self._base = np.cumsum([0] + [len(tile) for tile in self.tiles])
+        self.first_ids = list(self._base[:-1] if first_ids is None else first_ids)
+        self.ids = np.concatenate(
+            [np.arange(len(tile), dtype=np.int64) + first for tile, first in zip(self.tiles, self.first_ids)]
+            or [np.zeros(0, dtype=np.int64)]
+        )
+        vertex_base = np.cumsum([0] + [len(tile.vertices) for tile in self.tiles])
+        wall_base = np.cumsum([0] + [len(tile.wall_quads) for tile in self.tiles])
+
+        self.heights = np.concatenate([tile.heights for tile in self.tiles] or [np.zeros(0)])
+        self.bounds = np.concatenate([tile.bounds for tile in self.tiles] or [np.zeros((0, 4))])
+        self.bounds = self.bounds - np.tile(self.offset, 2)
+        self.offsets = np.concatenate(
+            [[0]] + [tile.offsets[1:] + base for tile, base in zip(self.tiles, vertex_base)]
+        ).astype(np.int64)
+        # first wall of every building, and the end of the walls of the last one
+        self._wall_offsets = np.concatenate([[0]] + [
+            np.searchsorted(tile.wall_owners, np.arange(1, len(tile) + 1)) + base
+            for tile, base in zip(self.tiles, wall_base)
+        ]).astype(np.int64)
+        self.vertices = TiledArray([tile.vertices for tile in self.tiles], self.offset, (2,))
+        self.wall_quads = TiledArray([tile.wall_quads for tile in self.tiles], np.append(self.offset, 0), (4, 3))
+
+    def __len__(self):
+        return int(self._base[-1])
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("building index out of range")
+        if i not in self._buildings:
+            tile = np.searchsorted(self._base, i, side="right") - 1
+            self._buildings[i] = StoredBuilding(self.tiles[tile], i - self._base[tile], self.offset)
+        return self._buildings[i]
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __reduce__(self):
+        return TiledBuildings, (self.tiles, self.offset, self.first_ids)
+
+    # indexes of the walls of the buildings and the building each of them belongs to
+    def walls_of(self, building_ids) -> tuple:
+        return _walls_of(self._wall_offsets, building_ids)
+
+
+# Rows of arrays split across tiles, read as one (N, *shape) array minus offset. Only the rows it is
+# indexed with are read from the tiles.
+class TiledArray:
+    def __init__(self, parts, offset, shape):
+        self.parts = parts
+        self.offset = offset
+        self.shape = (int(sum(len(part) for part in parts)),) + tuple(shape)
+        self._base = np.cumsum([0] + [len(part) for part in parts])
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            part = np.searchsorted(self._base, start, side="right") - 1
+            if step == 1 and start < stop <= self._base[min(part + 1, len(self.parts))]:
+                base = self._base[part]
+                return np.asarray(self.parts[part][start - base:stop - base]) - self.offset
+            key = np.arange(start, stop, step)
+        index = np.asarray(key, dtype=np.int64)
+        if index.ndim == 0:
+            return self[index[None]][0]
+        index = np.where(index < 0, index + len(self), index)
+        rows = np.empty(index.shape + self.shape[1:])
+        part = np.searchsorted(self._base, index, side="right") - 1
+        for k in np.unique(part):
+            rows[part == k] = self.parts[k][index[part == k] - self._base[k]]
+        return rows - self.offset
+
+    def __array__(self, dtype=None, copy=None):
+        rows = self[np.arange(len(self))]
+        return rows if dtype is None else rows.astype(dtype)
+
+
+# One building of a BuildingStore with the attributes the LOS engines read from Building. The shapely
+# and Geometry3D objects are only built when they are first used.
+class StoredBuilding:
+    def __init__(self, store, index, offset=(0.0, 0.0)):
+        self.store = store
+        self.index = index
+        # x, y subtracted from the vertices of the store
+        self.offset = np.asarray(offset, dtype=float)
+        self.height = float(store.heights[index])
+        self._xy_polygon = None
+        self._wall_polygons = None
+
+    @property
+    def xy_points(self) -> np.ndarray:
+        offsets = self.store.offsets
+        return np.array(self.store.vertices[offsets[self.index]:offsets[self.index + 1]]) - self.offset
+
+    @property
+    def xy_polygon(self):
+        if self._xy_polygon is None:
+            self._xy_polygon = geometry.Polygon(self.xy_points)
+        return self._xy_polygon
+
+    # same walls as Building.get_wall_polygons
+    @property
+    def wall_polygons(self) -> list:
+        if self._wall_polygons is None:
+            points = self.xy_points
+            self._wall_polygons = [
+                ConvexPolygon([
+                    Point(x1, y1, 0), Point(x2, y2, 0), Point(x1, y1, self.height), Point(x2, y2, self.height)
+                ])
+                for (x1, y1), (x2, y2) in zip(points[:-1], points[1:])
+            ]
+        return self._wall_polygons
+
+
+# indexes of the walls of the buildings, whose walls start at wall_offsets, and their buildings
+def _walls_of(wall_offsets, building_ids) -> tuple:
+    building_ids = np.asarray(building_ids, dtype=np.int64)
+    first = wall_offsets[building_ids]
+    counts = wall_offsets[building_ids + 1] - first
+    walls = np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+    return walls, np.repeat(building_ids, counts)
+
+
+# np.load cannot memory map an empty array, those are small enough to read
+def _load_array(path) -> np.ndarray:
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:
+        return np.load(path)
@@ -0,0 +1,55 @@
+"""
+Spectral overlap of the BS and FSS channel plans for the CCI-SWIFT ASCENT simulator
+
+Created: Oct 17, 2026
+For SWIFT-ASCENT
+"""
+
+import numpy as np
+
+
+# Overlap between every BS channel and every FSS channel, computed once from the absolute bands (Hz) of
+# the channels, bs_bands of shape (BS channels, 2) and fss_bands of shape (FSS channels, 2) holding
+# (start, end). BS channels are numbered from bs_first and FSS channels from fss_first.
+#   overlaps[b, f] is True when BS channel b and FSS channel f share part of their bands
+#   weights[b, f] is the fraction of the band of BS channel b within FSS channel f
+class ChannelPlan:
+    def __init__(self, bs_bands, fss_bands, bs_first=1, fss_first=0):
+        bs_bands = np.asarray(bs_bands, dtype=float).reshape(-1, 2)
+        fss_bands = np.asarray(fss_bands, dtype=float).reshape(-1, 2)
+        self.bs_first = bs_first
+        self.fss_first = fss_first
+        overlap = np.clip(
+            np.minimum(bs_bands[:, None, 1], fss_bands[None, :, 1])
+            - np.maximum(bs_bands[:, None, 0], fss_bands[None, :, 0]),
+            0, None,
+        )
+        self.overlaps = overlap > 0
+        self.weights = overlap / (bs_bands[:, 1] - bs_bands[:, 0])[:, None]
+
+    # plan of channel classes such as BS_Channels and FSS_Channels, whose getChannelRange gives the band
+    # of a channel from the range_start of the plan
+    @classmethod
+    def from_channels(cls, bs_channels, fss_channels, bs_first=1, fss_first=0) -> "ChannelPlan":
+        return cls(
+            [np.add(bs_channels.getChannelRange(channel), bs_channels.range_start)
+             for channel in range(bs_first, bs_first + bs_channels.channel_count)],
+            [np.add(fss_channels.getChannelRange(channel), fss_channels.range_start)
+             for channel in range(fss_first, fss_first + fss_channels.channel_count)],
+            bs_first, fss_first,
+        )
+
+    # Gain applied to the interference of each BS channel at an FSS receiving the channels where fss_status,
+    # of shape (..., FSS channels), is 1: 1 when the BS channel overlaps one of the FSS channels and 0
+    # otherwise, or the fraction of its band within the FSS channels when fractional. Of shape (..., BS channels).
+    def channel_gates(self, fss_status, fractional=False) -> np.ndarray:
+        fss_status = np.asarray(fss_status, dtype=bool)
+        if fractional:
+            return fss_status.astype(float) @ self.weights.T
+        return (fss_status[..., None, :] & self.overlaps).any(axis=-1).astype(float)
+
+    # channel_gates of the UEs on the BS ue_channels at an FSS receiving the FSS channels fss_channels
+    def gate(self, ue_channels, fss_channels, fractional=False) -> np.ndarray:
+        fss_status = np.zeros(self.overlaps.shape[1], dtype=bool)
+        fss_status[np.asarray(fss_channels, dtype=int) - self.fss_first] = True
+        return self.channel_gates(fss_status, fractional)[np.asarray(ue_channels, dtype=int) - self.bs_first]
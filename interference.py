@@ -0,0 +1,40 @@
+"""
+Interference link budget over arrays of links for the CCI-SWIFT ASCENT simulator
+
+Created: Oct 17, 2026
+For SWIFT-ASCENT
+"""
+
+import numpy as np
+
+# transmit power (dBm) of the 5G base stations and body loss (dB)
+TX_POWER = -6.77
+BODY_LOSS = 4
+
+
+# (theta, phi) angles (degrees) of the direction (x, y, z) seen from an antenna, between 0 and 360
+def pointing_angles(x, y, z) -> tuple:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        theta = np.degrees(np.arctan(y / x)) % 360
+        phi = np.degrees(np.sqrt(x ** 2 + y ** 2) / z) % 360
+    return theta, phi
+
+
+# Interference at the FSS of every BS steering its beam towards every UE it serves. The BS, UE and FSS
+# coordinates and the path loss (dB) of the BS to FSS links broadcast together, typically to
+# (BS, UE) with BS_X, BS_Y, BS_Z and path_loss of shape (BS, 1) and UE_X, UE_Y, UE_Z of shape (BS, UE).
+#   steer(theta, phi) returns the steering of the BS beams towards UEs at (theta, phi), as a tuple
+#   bs_gain(theta, phi, *steering) returns the gain (dBi) of the steered BS antennas towards (theta, phi)
+#   fss_gain(phi) returns the gain (dBi) of the FSS antenna phi degrees off its main axis, at FSS_phi
+# The pointing angles and the steering are computed from the coordinates as given, float64 for the steering
+# to land in the same cell of the tables as the per-drop engine, and the gains are summed in dtype.
+# Returns the interference in dBm and in mW.
+def interference(BS_X, BS_Y, BS_Z, UE_X, UE_Y, UE_Z, FSS_X, FSS_Y, FSS_Z, FSS_phi, path_loss, steer, bs_gain,
+                 fss_gain, dtype=np.float64) -> tuple:
+    theta_bs_ue, phi_bs_ue = pointing_angles(UE_X - BS_X, UE_Y - BS_Y, UE_Z - BS_Z)
+    steering = steer(theta_bs_ue, phi_bs_ue)
+    theta_bs_es, phi_bs_es = pointing_angles(BS_X - FSS_X, BS_Y - FSS_Y, BS_Z - FSS_Z)
+    G_5G_R = np.asarray(bs_gain(theta_bs_es, phi_bs_es, *steering), dtype=dtype)
+    G_Rx_5G = np.asarray(fss_gain(np.abs(FSS_phi - phi_bs_es)), dtype=dtype)
+    interference_dBm = TX_POWER + G_5G_R - np.asarray(path_loss, dtype=dtype) - BODY_LOSS + G_Rx_5G
+    return interference_dBm, 10 ** (interference_dBm / 10)
@@ -0,0 +1,146 @@
+"""
+Path loss kernels over arrays of links for the CCI-SWIFT ASCENT simulator
+
+Created: Oct 17, 2026
+For SWIFT-ASCENT
+"""
+
+import math
+
+import numpy as np
+
+# carrier frequency (GHz)
+FC = 12
+
+# BS antenna height (meters) of each deployment scenario
+BS_HEIGHTS = {"UMi": 10, "UMa": 25, "RMa": 35}
+
+
+# Attenuation factor (dB/m) of rain falling at rain_rate mm/h, vertical polarization. Computed once per
+# request and passed to the kernels, 0 without rain.
+def rain_attenuation(rain_rate, fc=FC) -> float:
+    x = rain_rate
+    P = -5.520 * 10 ** -12 * x ** 3 + 3.26 * 10 ** -9 * x ** 2 - 1.21 * x * 10 ** -7 - 6 * 10 ** -6  # av
+    Q = 8 * 10 ** -10 * x ** 3 - 4.552 * 10 ** -7 * x ** 2 - 3.03 * x * 10 ** -5 + 0.001  # bv
+    R = -5.71 * 10 ** -9 * x ** 3 + 6 * 10 ** -7 * x ** 2 + 8.707 * x * 10 ** -3 - 0.018  # cv
+    S = - 1.073 * 10 ** -7 * x ** 3 + 1.068 * 10 ** -4 * x ** 2 - 0.0598 * x + 0.0442  # dv
+    return (P * (fc ** 3) + Q * (fc ** 2) + R * fc + S) / 1000
+
+
+# Path loss of links crossing walls or buildings: the NLOS path loss when crossings is not 0 and
+# penetration_loss is None (LOS/NLOS switch), else the LOS path loss plus penetration_loss dB per crossing
+def blocked_path_loss(path_loss_los, path_loss_nlos, crossings, penetration_loss=None) -> np.ndarray:
+    if penetration_loss is None:
+        return np.where(np.asarray(crossings) == 0, path_loss_los, path_loss_nlos)
+    return path_loss_los + np.asarray(crossings) * penetration_loss
+
+
+# The kernels below take arrays (or scalars) of BS and FSS coordinates which broadcast together, one
+# element per link, and return the path loss (dB) and the distance d_2D of every link.
+
+# UMi street canyon, BS 10 m high, with the rain attenuation added to the LOS and NLOS path loss
+def umi_path_loss(BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, crossings=0, rain_attenuation=0.0,
+                  penetration_loss=None) -> tuple:
+    fc = FC
+    ##(10m<=d_2D)<=D_BP:
+    d_2D = np.sqrt(((FSS_X - BS_X) ** 2) + ((FSS_Y - BS_Y) ** 2) + ((FSS_Z - BS_Z) ** 2))
+    hBs = 10
+    d_3D = np.sqrt(hBs ** 2 + d_2D ** 2)
+    PL1umi = 32.4 + 21 * np.log10(d_3D) + 20 * math.log10(fc)
+
+    ##(D_BP<=d_2D)<=5000m:
+    hUT = 4.5
+    hE = 1
+    hBs1 = hBs - hE
+    hUT1 = hUT - hE
+    c = 3e8
+    D_BP = (4 * hBs1 * hUT1 * 12e9) / c
+    PL2umi = 32.4 + 40 * np.log10(d_3D) + 20 * math.log10(fc) - 9.5 * math.log10((D_BP) ** 2 + (hBs - hUT) ** 2)
+
+    PLUMiLOS = _los_branches(d_2D, D_BP, 5000, PL1umi, PL2umi) + rain_attenuation
+    ##NLOS,SF=7.82:
+    PL1umiNLOS = (35.3 * np.log10(d_3D) + 22.4 + 21.3 * math.log10(fc) - 0.3 * (hUT - 1.5)) + rain_attenuation
+    PLUMiNLOS = np.maximum(PLUMiLOS, PL1umiNLOS)
+    return blocked_path_loss(PLUMiLOS, PLUMiNLOS, crossings, penetration_loss), d_2D
+
+
+# UMa, BS 25 m high
+def uma_path_loss(BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, crossings=0, penetration_loss=None) -> tuple:
+    fc = FC
+    ##(10m<=d_2D)<=D_BP:
+    d_2D = np.sqrt(((FSS_X - BS_X) ** 2) + (FSS_Y - BS_Y) ** 2) + ((FSS_Z - BS_Z) ** 2)
+    hBs = 25
+    d_3D = np.sqrt(hBs ** 2 + d_2D ** 2)
+    PL3uma = 28.0 + 22 * np.log10(d_3D) + 20 * math.log10(fc)
+
+    ##(D_BP<=d_2D) <=5000m:
+    hUT = 4.5
+    hE = 1
+    hBs1 = hBs - hE
+    hUT1 = hUT - hE
+    c = 3 * 10 ** 8
+    D_BP = (4 * hBs1 * hUT1 * fc) / c
+    PL4uma = 28.0 + 40 * np.log10(d_3D) + 20 * math.log10(fc) - 9 * math.log10((D_BP) ** 2 + (hBs - hUT) ** 2)
+
+    PLUMALOS = _los_branches(d_2D, D_BP, 5000, PL3uma, PL4uma)
+    ##NLOS,SF=6:
+    PL1NLOSuma = 13.54 + 39.08 * np.log10(d_3D) + 20 * math.log10(fc) - 0.6 * (hUT - 1.5)
+    PLUMANLOS = np.maximum(PLUMALOS, PL1NLOSuma)
+    return blocked_path_loss(PLUMALOS, PLUMANLOS, crossings, penetration_loss), d_2D
+
+
+# RMa, BS 35 m high
+def rma_path_loss(BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, crossings=0, penetration_loss=None) -> tuple:
+    fc = FC
+    h = 5
+    ##10m<=d_2D<=d_BP:
+    d_2D = np.sqrt(((FSS_X - BS_X) ** 2) + ((FSS_Y - BS_Y) ** 2) + ((FSS_Z - BS_Z) ** 2))
+    hBs = 35
+    d_3D = np.sqrt(hBs ** 2 + d_2D ** 2)
+    PL1rma = (
+            20 * np.log10((40 * math.pi * d_3D * fc) / 3)
+            + min(0.03 * h ** 1.72, 10) * np.log10(d_3D)
+            - min(0.044 * h ** 1.72, 14.77)
+            + 0.002 * math.log10(h) * d_3D
+    )
+
+    ##d_BP<=d_2D<=10km:
+    hUT = 4.5
+    c = 3 * 10 ** 8
+    d_BP = (2 * math.pi * hBs * hUT * fc) / c
+    PL2rma = PL1rma * (d_BP) + 40 * np.log10(d_3D / d_BP)
+
+    PLRMALOS = _los_branches(d_2D, d_BP, 10000, PL1rma, PL2rma)
+    ##NLOS,SF=8:
+    W = 20
+    PL1NLOSrma = (
+            161.04
+            - 7.11 * math.log10(W)
+            + 7.5 * math.log10(h)
+            - (24.37 - 3.7 * (h / hBs) ** 2) * math.log10(hBs)
+            + (43.42 - 3.1 * math.log10(hBs)) * (np.log10(d_3D) - 3)
+            + 20 * math.log10(fc)
+            - (3.2 * (math.log10(11.75 * hUT)) ** 2 - 4.97)
+    )
+    PLRMANLOS = np.maximum(PLRMALOS, PL1NLOSrma)
+    return blocked_path_loss(PLRMALOS, PLRMANLOS, crossings, penetration_loss), d_2D
+
+
+# path loss of the links of one deployment scenario ("UMi", "UMa" or "RMa"), BS_Z is the BS height of
+# the scenario. Only the UMi model adds the rain attenuation.
+def scenario_path_loss(scenario, BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, crossings=0, rain_attenuation=0.0,
+                       penetration_loss=None) -> tuple:
+    if scenario == "UMi":
+        return umi_path_loss(BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, crossings, rain_attenuation, penetration_loss)
+    if scenario == "UMa":
+        return uma_path_loss(BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, crossings, penetration_loss)
+    if scenario == "RMa":
+        return rma_path_loss(BS_X, BS_Y, BS_Z, FSS_X, FSS_Y, FSS_Z, crossings, penetration_loss)
+    raise ValueError(f"Unknown deployment scenario {scenario!r}")
+
+
+# LOS path loss: near below the breakpoint, far from the breakpoint to max_distance, 1 elsewhere
+def _los_branches(d_2D, breakpoint, max_distance, near, far) -> np.ndarray:
+    return np.select(
+        [(10 <= d_2D) & (d_2D <= breakpoint), (breakpoint <= d_2D) & (d_2D <= max_distance)], [near, far], 1.0
+    )
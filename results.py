@@ -0,0 +1,49 @@
+"""
+Result buffers of the Monte Carlo drops for the CCI-SWIFT ASCENT simulator
+
+Created: Oct 17, 2026
+For SWIFT-ASCENT
+"""
+
+import numpy as np
+
+# deployment scenarios of the results, the response always holds UMi
+SCENARIOS = ("UMi", "UMa", "RMa")
+
+
+# Results of one drop, views of the rows of a SimulationResults which simulate writes into
+class DropResults:
+    def __init__(self, distance, line_of_sight, I_N_W):
+        self.distance = distance
+        self.line_of_sight = line_of_sight
+        self.I_N_W = I_N_W
+
+
+# Columnar results of the drops of a request, preallocated for drops x base_stations x fss links. Rows
+# are drops, columns are links numbered i * fss + j from BS i to FSS j, or base stations for I/N.
+class SimulationResults:
+    def __init__(self, drops, base_stations, fss=1, scenarios=("UMi",)):
+        self.scenarios = tuple(scenarios)
+        self.distance = np.zeros((drops, base_stations * fss))
+        self.line_of_sight = np.zeros((drops, base_stations * fss))
+        # scenario -> I/N (W) of each BS, summed over the UEs it serves
+        self.I_N_W = {scenario: np.zeros((drops, base_stations)) for scenario in SCENARIOS}
+
+    def drop(self, i) -> DropResults:
+        return DropResults(
+            self.distance[i], self.line_of_sight[i], {scenario: I_N[i] for scenario, I_N in self.I_N_W.items()}
+        )
+
+    # I/N (dB) of each BS of each drop, 0 where no UE interferes
+    def I_N_dB(self, scenario) -> np.ndarray:
+        with np.errstate(divide="ignore"):
+            I_N = 10 * np.log10(self.I_N_W[scenario].ravel())
+        I_N[I_N == -np.inf] = 0
+        return I_N
+
+    def to_dict(self) -> dict:
+        return {
+            f"Interference_values_{scenario}_each_Bs": self.I_N_dB(scenario).tolist()
+            for scenario in SCENARIOS
+            if scenario == "UMi" or scenario in self.scenarios
+        }
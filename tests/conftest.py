@@ -0,0 +1,101 @@
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import blockage
+import building_store
+import Simulator
+
+# FSS of the synthetic city
+LAT_FSS = 37.20250
+LON_FSS = -80.43444
+
+
+# GeoJSON of buildings polygons scattered around the FSS, half of them without a height
+def write_city(path, buildings=150, seed=1, spread=0.01):
+    rnd = random.Random(seed)
+    features = []
+    for _ in range(buildings):
+        lon = LON_FSS + rnd.uniform(-spread, spread)
+        lat = LAT_FSS + rnd.uniform(-spread, spread)
+        corners = rnd.choice([4, 5, 6])
+        size = rnd.uniform(0.0001, 0.0006)
+        ring = [[lon + size * math.cos(2 * math.pi * k / corners + 0.3),
+                 lat + size * math.sin(2 * math.pi * k / corners + 0.3)] for k in range(corners)]
+        ring.append(ring[0])
+        properties = {"height": rnd.randint(5, 40)} if rnd.random() < 0.5 else {}
+        features.append({"type": "Feature", "properties": properties,
+                         "geometry": {"type": "Polygon", "coordinates": [ring]}})
+    with open(path, "w") as file:
+        json.dump({"type": "FeatureCollection", "features": features}, file)
+
+
+# base stations of a request, scattered around the FSS
+def base_stations(count, seed=2):
+    rnd = random.Random(seed)
+    stations = []
+    for i in range(count):
+        lat = LAT_FSS + rnd.uniform(-0.009, 0.009)
+        lon = LON_FSS + rnd.uniform(-0.009, 0.009)
+        stations.append({
+            "cid": i, "latitude": lat, "longitude": lon, "range": 1, "samples": 1, "averageSignal": 0,
+            "changeable": 1, "lac": 1, "mcc": 1, "mnc": 1, "radio": "LTE", "status": "", "unique_id": i,
+            "unit": 1, "updated": 0,
+            "dist_from_FSS": math.hypot((lat - LAT_FSS) * 111000, (lon - LON_FSS) * 88000),
+        })
+    return stations
+
+
+# directory holding the GeoJSON of the synthetic city and its building tiles
+@pytest.fixture(scope="session")
+def city(tmp_path_factory):
+    path = tmp_path_factory.mktemp("city")
+    write_city(path / "city.geojson")
+    building_store.ingest_geojson(path / "city.geojson", path / "tiles")
+    return path
+
+
+# context of the LOS engines over the buildings of the synthetic city
+def los_context(city, los_engine, blockage_mode="boolean"):
+    buildings = building_store.load_buildings(city / "tiles", LAT_FSS, LON_FSS, 2000)
+    ctx = Simulator.Context()
+    ctx.buildings = buildings
+    ctx.building_index = blockage.BuildingIndex(buildings.bounds, radius=2000)
+    ctx.los_engine = los_engine
+    ctx.blockage_mode = blockage_mode
+    ctx.x_FSS, ctx.y_FSS = building_store.fss_xy(LAT_FSS, LON_FSS)
+    ctx.x, ctx.y = 0, 0
+    ctx.saved_los = blockage.LOSStore(":memory:")
+    return ctx
+
+
+# run_simulator over the synthetic city in a directory of its own, returns the response
+@pytest.fixture
+def simulator(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data")
+    write_city("data/export (1).geojson")
+
+    def run(simulation_count=4, base_station_count=4, rain=False, rain_rate=26.43, lat_FSS=LAT_FSS, lon_FSS=LON_FSS,
+            **options):
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            return Simulator.run_simulator(
+                lat_FSS, lon_FSS, 1500, simulation_count, 200, 10, base_station_count, rain, rain_rate, 300,
+                base_stations(base_station_count), **options
+            )
+
+    return run
+
+
+# (theta, phi) angles of random directions, between 0 and 360 degrees
+def random_angles(count, seed=0):
+    return np.random.default_rng(seed).uniform(0, 360, size=(2, count))
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+from scipy import optimize
+
+import antenna
+import Simulator
+from conftest import random_angles
+
+# search grid of optimize.brute in build_steering_table
+BRUTE_GRID = np.mgrid[tuple(slice(low, high, complex(antenna.STEERING_GRID)) for low, high in antenna.STEERING_RANGES)]
+
+
+# steering towards (theta, phi) found by the solver of the steering table, brute grid then optimize.fmin
+def brute_steering(theta, phi):
+    grid = BRUTE_GRID.reshape(2, -1)
+    x0 = grid[:, np.argmax(antenna.beam_pattern(theta, phi, grid[0], grid[1]))]
+    return optimize.fmin(lambda x: -antenna.beam_pattern(theta, phi, x[0], x[1]), x0, disp=False)
+
+
+# a_A of the element by element double sum of the scalar model, with the weighting and superposition of
+# Simulator
+def summed_pattern(theta, phi, theta_tilt, phi_scan, geometry=antenna.DEFAULT_ARRAY):
+    rows, cols, hspace, vspace = geometry.rows, geometry.cols, geometry.hspace, geometry.vspace
+    summation = sum(
+        Simulator.weighting(n, m, theta_tilt, phi_scan, hspace, vspace, rows, cols)
+        * Simulator.superposition(n, m, theta, phi, hspace, vspace)
+        for n in range(1, rows + 1) for m in range(1, cols + 1)
+    )
+    return abs(summation) ** 2
+
+
+class TestBeamPattern:
+    def test_matches_double_sum(self):
+        """ The factored beam pattern is the double sum over the elements, for any array geometry """
+        theta, phi = random_angles(20)
+        steering = np.random.default_rng(1).uniform(-60, 60, size=(2, 20))
+        for geometry in (antenna.DEFAULT_ARRAY, antenna.ArrayGeometry(4, 8, 0.5, 0.7)):
+            pattern = antenna.beam_pattern(theta, phi, *steering, geometry)
+            expected = [summed_pattern(*angles, geometry) for angles in zip(theta, phi, *steering)]
+            np.testing.assert_allclose(pattern, expected, rtol=1e-9, atol=1e-9)
+
+
+class TestPatterns:
+    def test_fss_patterns(self):
+        """ The FSS patterns are symmetric about 180 degrees and follow their recommendations """
+        phi = np.array([0.0, 1.0, 5.0, 20.0, 47.0, 100.0])
+        np.testing.assert_allclose(antenna.fss_gain_s1428(phi), [32 - 25 * np.log10(2.0)] * 2
+                                   + [32 - 25 * np.log10(angle) for angle in phi[2:5]] + [-10.0])
+        np.testing.assert_allclose(antenna.fss_gain_wbes_b(phi), [20.0, 20.0, 20.0, 40 - 25 * np.log10(20.0),
+                                                                  40 - 25 * np.log10(47.0), -2.0])
+        for pattern in antenna.FSS_PATTERNS.values():
+            np.testing.assert_array_equal(pattern(360 - phi), pattern(phi))
+        sampled = antenna.SampledPattern(antenna.fss_gain_s1428, step=0.01)
+        np.testing.assert_allclose(sampled([10.0, 30.0]), antenna.fss_gain_s1428([10.0, 30.0]), atol=1e-3)
+        with pytest.raises(ValueError):
+            antenna.fss_gain_wbes_b(361)
+        with pytest.raises(ValueError):
+            antenna.get_pattern(antenna.FSS_PATTERNS, "s465")
+
+
+class TestSteering:
+    def test_solver_matches_table_at_integer_angles(self):
+        """ solve_steering gives the steering table entries at integer angles """
+        table = antenna.open_steering_table()
+        theta, phi = np.round(random_angles(200))
+        theta_tilt, phi_scan, _, _ = antenna.solve_steering(theta, phi, table)
+        np.testing.assert_array_equal(theta_tilt, table.lookup(theta, phi)[0])
+        np.testing.assert_array_equal(phi_scan, table.lookup(theta, phi)[1])
+
+    def test_solver_matches_table_solver_between_integer_angles(self):
+        """ Between integer angles solve_steering finds the gain of the brute force solver of the table """
+        table = antenna.open_steering_table()
+        theta, phi = np.round(random_angles(40, seed=1), 2)
+        theta_tilt, phi_scan, pattern, _ = antenna.solve_steering(theta, phi, table)
+        start = antenna.beam_pattern(theta, phi, *table.lookup(theta, phi))
+        assert np.all(pattern >= start)
+        for i in range(len(theta)):
+            expected = antenna.gain_5g(theta[i], phi[i], *brute_steering(theta[i], phi[i]))
+            assert abs(antenna.gain_5g(theta[i], phi[i], theta_tilt[i], phi_scan[i]) - expected) < 0.02
+
+    @pytest.mark.parametrize("coarse_grid", [0, 10])
+    def test_solver_without_table(self, coarse_grid):
+        """ Without a table, the analytic guess and the coarse grid find the gain of the brute force solver """
+        theta, phi = np.round(random_angles(40, seed=2), 2)
+        theta_tilt, phi_scan, _, evaluations = antenna.solve_steering(theta, phi, coarse_grid=coarse_grid)
+        assert np.all(evaluations > coarse_grid ** 2)
+        for i in range(len(theta)):
+            expected = antenna.gain_5g(theta[i], phi[i], *brute_steering(theta[i], phi[i]))
+            assert abs(antenna.gain_5g(theta[i], phi[i], theta_tilt[i], phi_scan[i]) - expected) < 0.02
+
+
+class TestSteeringTable:
+    def test_missing_table(self, tmp_path):
+        """ The table of another geometry is not built at request time, the error tells how to build it """
+        geometry = antenna.ArrayGeometry(8, 8, 0.5, 0.5)
+        with pytest.raises(FileNotFoundError, match="python antenna.py 8 8 0.5 0.5"):
+            antenna.open_steering_table(geometry, tmp_path)
+        table = np.zeros((361, 361, 3))
+        antenna._save_table(antenna.steering_table_path(geometry, tmp_path), table)
+        np.testing.assert_array_equal(antenna.open_steering_table(geometry, tmp_path).table, table)
+
+    def test_simulator_without_table(self, simulator):
+        """ Finer steering precisions are solved without the table of the geometry, precision 0 needs it """
+        geometry = {"rows": 8, "cols": 8, "hspace": 0.5, "vspace": 0.5}
+        response = simulator(array_geometry=geometry, steering_precision=2)
+        assert len(response["Interference_values_UMi_each_Bs"]) == 4 * 4
+        with pytest.raises(FileNotFoundError):
+            simulator(array_geometry=geometry)
+
+
+class TestCodebook:
+    def test_gain_between_integer_angles(self, tmp_path):
+        """ The gain of the selected beam is the 5G gain at the exact angles, not at the nearest integers """
+        codebook = antenna.open_codebook(tmp_path, antenna.dft_codebook(4, 4))
+        theta, phi = random_angles(50)
+        beam = codebook.select(theta, phi)
+        np.testing.assert_array_equal(beam, np.argmax(codebook.gains[np.round(theta).astype(int),
+                                                                     np.round(phi).astype(int)], axis=-1))
+        expected = antenna.gain_5g(theta, phi, *codebook.beams[beam].T)
+        np.testing.assert_allclose(codebook.gain(theta, phi, beam), expected)
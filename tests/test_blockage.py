@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+import blockage
+import Simulator
+from conftest import los_context
+
+# BS of the links tested against the buildings of the synthetic city, 10 m high, and the FSS at the origin
+BS_POINTS = np.random.default_rng(3).uniform(-900, 900, size=(40, 2))
+
+
+# walls or buildings crossed by every BS to FSS link with the LOS engine of ctx
+def link_counts(ctx, height=10.0):
+    if ctx.los_engine == "geometry3d":
+        return np.array([Simulator.link_crossings(x, y, height, 0.0, 0.0, 4.5, ctx) for x, y in BS_POINTS])
+    return Simulator.batch_crossings(BS_POINTS[:, 0], BS_POINTS[:, 1], height, 0.0, 0.0, 4.5, ctx)[:, 0]
+
+
+class TestEngineParity:
+    @pytest.mark.parametrize("blockage_mode, engines", [
+        ("boolean", ("geometry3d", "vectorized", "prism")),
+        ("walls", ("geometry3d", "vectorized")),
+        ("buildings", ("geometry3d", "vectorized", "prism")),
+    ])
+    def test_link_counts_match(self, city, blockage_mode, engines):
+        """ Every exact LOS engine counts the same crossings on every link """
+        counts = {engine: link_counts(los_context(city, engine, blockage_mode)) for engine in engines}
+        for engine in engines[1:]:
+            np.testing.assert_array_equal(counts[engine], counts[engines[0]], err_msg=engine)
+        assert counts[engines[0]].max() > 1 or blockage_mode == "boolean"
+
+    def test_scenario_heights(self, city):
+        """ Crossings of all the scenario heights at once are those of each height alone """
+        ctx = los_context(city, "vectorized", "walls")
+        heights = [10.0, 25.0, 35.0]
+        crossings = Simulator.scenario_crossings(BS_POINTS[:, 0], BS_POINTS[:, 1], heights, 0.0, 0.0, 4.5, ctx)
+        for k, height in enumerate(heights):
+            np.testing.assert_array_equal(crossings[k, :, 0], link_counts(ctx, height))
+
+    def test_prism_rejects_walls(self, city):
+        """ The prism engine only counts buildings """
+        with pytest.raises(ValueError):
+            link_counts(los_context(city, "prism", "walls"))
+
+
+class TestSegmentWalls:
+    def test_crossing(self):
+        """ A segment through a wall hits it, one passing over it does not """
+        wall = np.array([[[0, -1, 0], [0, 1, 0], [0, 1, 5], [0, -1, 5]]], dtype=float)
+        hits = blockage.segment_wall_hits([[-1, 0, 1], [-1, 0, 6]], [[1, 0, 1], [1, 0, 6]], wall)
+        np.testing.assert_array_equal(hits[:, 0], [True, False])
+
+    def test_count_per_building(self):
+        """ Walls of one building count once per building """
+        quads = np.array([
+            [[0, -1, 0], [0, 1, 0], [0, 1, 5], [0, -1, 5]],
+            [[1, -1, 0], [1, 1, 0], [1, 1, 5], [1, -1, 5]],
+        ], dtype=float)
+        start, end = [[-1, 0, 1]], [[2, 0, 1]]
+        assert blockage.count_crossings(start, end, quads, [0, 0], per="walls")[0] == 2
+        assert blockage.count_crossings(start, end, quads, [0, 0], per="buildings")[0] == 1
+        assert blockage.count_crossings(start, end, quads, [0, 0], first_hit=True)[0] == 1
+
+
+class TestBuildingIndex:
+    def test_query_matches_brute_force(self, city):
+        """ The index returns the buildings of every wall a link crosses, as a scan over all walls finds them """
+        ctx = los_context(city, "vectorized", "buildings")
+        buildings = ctx.buildings
+        index = blockage.BuildingIndex(buildings.bounds, radius=800, cell_size=50.0)
+        walls, owners = buildings.walls_of(np.arange(len(buildings)))
+        quads = np.asarray(buildings.wall_quads)[walls]
+        nearest = np.hypot(np.clip(0, buildings.bounds[:, 0], buildings.bounds[:, 2]),
+                           np.clip(0, buildings.bounds[:, 1], buildings.bounds[:, 3]))
+        in_radius = np.flatnonzero(nearest <= 800)
+        assert 0 < len(index) == len(in_radius) < len(buildings)
+
+        crossings = 0
+        for x, y in BS_POINTS:
+            # links 1 m above the ground cross every wall their 2D projection crosses
+            hits = blockage.segment_wall_hits([x, y, 1.0], [0.0, 0.0, 1.0], quads)[0]
+            crossed = np.intersect1d(owners[hits], in_radius)
+            crossings += len(crossed)
+            found = index.query_segment((x, y), (0.0, 0.0))
+            assert set(crossed) <= set(found)
+            boxes = blockage.segment_crosses_boxes((x, y), (0.0, 0.0), buildings.bounds[in_radius])
+            np.testing.assert_array_equal(np.sort(found), in_radius[boxes])
+        assert crossings > 0
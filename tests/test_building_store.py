@@ -0,0 +1,80 @@
+import json
+import os
+import pickle
+
+import numpy as np
+
+import building_store
+from conftest import LAT_FSS, LON_FSS, write_city
+
+
+# the tiles of load_buildings copied into one in-memory store relative to the FSS
+def concatenated(buildings):
+    offset = buildings.offset
+    wall_quads = np.concatenate([tile.wall_quads for tile in buildings.tiles])
+    wall_quads[:, :, :2] -= offset
+    building_base = np.cumsum([0] + [len(tile) for tile in buildings.tiles])
+    return {
+        "vertices": np.concatenate([tile.vertices for tile in buildings.tiles]) - offset,
+        "heights": np.concatenate([tile.heights for tile in buildings.tiles]),
+        "wall_quads": wall_quads,
+        "wall_owners": np.concatenate([tile.wall_owners + base for tile, base in zip(buildings.tiles, building_base)]),
+    }
+
+
+class TestTiledBuildings:
+    def test_tiles_stay_memory_mapped(self, tmp_path):
+        """ Buildings spread over several tiles are read from the memory-mapped tiles, relative to the FSS """
+        write_city(tmp_path / "city.geojson", buildings=300, spread=0.08)
+        building_store.ingest_geojson(tmp_path / "city.geojson", tmp_path / "tiles")
+        buildings = building_store.load_buildings(tmp_path / "tiles", LAT_FSS, LON_FSS, 20000)
+        assert len(buildings.tiles) > 1
+        assert all(isinstance(tile.wall_quads, np.memmap) for tile in buildings.tiles)
+
+        arrays = concatenated(buildings)
+        np.testing.assert_array_equal(np.asarray(buildings.vertices), arrays["vertices"])
+        np.testing.assert_array_equal(np.asarray(buildings.wall_quads), arrays["wall_quads"])
+        np.testing.assert_array_equal(buildings.heights, arrays["heights"])
+
+        ids = np.random.default_rng(0).choice(len(buildings), 40, replace=False)
+        walls, owners = buildings.walls_of(ids)
+        expected = np.concatenate([np.flatnonzero(arrays["wall_owners"] == i) for i in ids])
+        np.testing.assert_array_equal(walls, expected)
+        np.testing.assert_array_equal(owners, arrays["wall_owners"][expected])
+        np.testing.assert_array_equal(buildings.wall_quads[walls], arrays["wall_quads"][expected])
+        for i in ids[:5]:
+            ring = buildings.vertices[buildings.offsets[i]:buildings.offsets[i + 1]]
+            np.testing.assert_array_equal(buildings[i].xy_points, ring)
+
+        copy = pickle.loads(pickle.dumps(buildings))
+        np.testing.assert_array_equal(np.asarray(copy.wall_quads), arrays["wall_quads"])
+
+
+class TestIngest:
+    def test_batches_stream_to_tiles(self, tmp_path):
+        """ Small batches flushed to the tiles give the same stores as one batch """
+        write_city(tmp_path / "city.geojson", buildings=200, spread=0.08)
+        assert building_store.ingest_geojson(tmp_path / "city.geojson", tmp_path / "one") == (200, 0)
+        assert building_store.ingest_geojson(tmp_path / "city.geojson", tmp_path / "many", batch_size=7) == (200, 0)
+
+        with open(tmp_path / "one" / "manifest.json") as one, open(tmp_path / "many" / "manifest.json") as many:
+            tiles = json.load(one)["tiles"]
+            assert json.load(many)["tiles"] == tiles
+        assert sorted(os.listdir(tmp_path / "many")) == sorted([*tiles, "manifest.json"])
+        for tile in tiles:
+            for name in building_store.STORE_ARRAYS:
+                np.testing.assert_array_equal(
+                    np.load(tmp_path / "one" / tile / f"{name}.npy"), np.load(tmp_path / "many" / tile / f"{name}.npy")
+                )
+
+    def test_missing_heights_are_seeded(self, tmp_path):
+        """ Buildings without a height get the same heights on every ingest with the same seed """
+        write_city(tmp_path / "city.geojson")
+        heights = []
+        for name, seed in (("one", 0), ("two", 0), ("three", 1)):
+            building_store.ingest_geojson(tmp_path / "city.geojson", tmp_path / name, seed=seed)
+            heights.append(building_store.load_buildings(tmp_path / name, LAT_FSS, LON_FSS, 20000).heights)
+        np.testing.assert_array_equal(heights[0], heights[1])
+        assert not np.array_equal(heights[0], heights[2])
+        assert building_store.is_tile_cache(tmp_path / "one", tmp_path / "city.geojson")
+        assert not building_store.is_tile_cache(tmp_path / "three", tmp_path / "city.geojson")
@@ -0,0 +1,32 @@
+import numpy as np
+
+import Simulator
+from channel_plan import ChannelPlan
+
+
+# True when the bands (start, end) of BS channel b and FSS channel f of the simulator intersect
+def bands_overlap(b, f):
+    bs_start, bs_end = np.add(Simulator.BS_Channels.getChannelRange(b), Simulator.BS_Channels.range_start)
+    fss_start, fss_end = np.add(Simulator.FSS_Channels.getChannelRange(f), Simulator.FSS_Channels.range_start)
+    return min(bs_end, fss_end) > max(bs_start, fss_start)
+
+
+class TestChannelPlan:
+    def test_overlaps_of_the_simulator_plan(self):
+        """ Every BS channel overlaps the FSS channels whose bands it intersects """
+        plan = ChannelPlan.from_channels(Simulator.BS_Channels, Simulator.FSS_Channels)
+        expected = [[bands_overlap(b, f) for f in range(Simulator.FSS_Channels.channel_count)]
+                    for b in range(1, Simulator.BS_Channels.channel_count + 1)]
+        np.testing.assert_array_equal(plan.overlaps, expected)
+        assert plan.overlaps.any() and not plan.overlaps.all()
+
+    def test_gates(self):
+        """ Gates are 1 for overlapping channels, or the fraction of the BS band within the FSS channels """
+        plan = ChannelPlan([[0, 10], [10, 20], [20, 30]], [[5, 15], [25, 40]])
+        np.testing.assert_array_equal(plan.channel_gates([1, 0]), [1, 1, 0])
+        np.testing.assert_allclose(plan.channel_gates([1, 1], fractional=True), [0.5, 0.5, 0.5])
+        np.testing.assert_array_equal(plan.gate([1, 3, 3], [1]), [0, 1, 1])
+        status = np.random.default_rng(0).integers(0, 2, size=(4, 3, 2))
+        gates = plan.channel_gates(status, fractional=True)
+        for index in np.ndindex(status.shape[:-1]):
+            np.testing.assert_allclose(gates[index], plan.channel_gates(status[index], fractional=True))
@@ -0,0 +1,52 @@
+import types
+
+import numpy as np
+import pytest
+
+import Simulator
+
+
+# I/N (dB) of every drop and BS of a run of the simulator
+def interference_dB(response):
+    return np.array(response["Interference_values_UMi_each_Bs"])
+
+
+# batch_memory of blocks of 16 drops with the 4 BS of the simulator fixture
+BLOCK_MEMORY = 16 * 4 * 30 * 8 * Simulator.BATCH_ARRAYS
+
+
+class TestDropEngines:
+    @pytest.mark.parametrize("options", [
+        {"drop_engine": "batched"},
+        {"workers": 2},
+        {"drop_engine": "batched", "workers": 2},
+    ])
+    @pytest.mark.parametrize("batch_memory", [BLOCK_MEMORY, 1])
+    def test_engines_match_loop(self, simulator, options, batch_memory):
+        """ Seeded drops give the same results in every engine, with or without workers """
+        expected = interference_dB(simulator(simulation_count=40, batch_memory=batch_memory))
+        np.testing.assert_array_equal(
+            interference_dB(simulator(simulation_count=40, batch_memory=batch_memory, **options)), expected,
+        )
+
+    def test_block_size(self):
+        """ The blocks of drops fit in batch_memory, whatever the dtype """
+        links = types.SimpleNamespace(BS_X=np.zeros(4))
+        assert Simulator.drop_block(links, types.SimpleNamespace(), BLOCK_MEMORY) == 16
+        assert Simulator.drop_block(links, types.SimpleNamespace(), 1) == 1
+        blocks = Simulator.drop_blocks(40, 16, seed=3)
+        assert [(block.start, block.stop) for block, _ in blocks] == [(0, 16), (16, 32), (32, 40)]
+
+    def test_seed(self, simulator):
+        """ The drops only depend on the seed """
+        first = interference_dB(simulator(seed=3))
+        np.testing.assert_array_equal(interference_dB(simulator(seed=3)), first)
+        assert not np.array_equal(interference_dB(simulator(seed=4)), first)
+
+
+class TestBatchedDrops:
+    def test_float32_tolerance(self, simulator):
+        """ float32 batched drops stay within 1e-4 dB of float64, the steering landing in the same cells """
+        float64 = interference_dB(simulator(simulation_count=100, drop_engine="batched"))
+        float32 = interference_dB(simulator(simulation_count=100, drop_engine="batched", float32=True))
+        np.testing.assert_allclose(float32, float64, rtol=0, atol=1e-4)
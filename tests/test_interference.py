@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+import antenna
+import interference
+import Simulator
+
+
+class TestInterference:
+    def test_matches_scalar_link_budget(self):
+        """ The array link budget gives every UE the interference of the scalar Interface_UMa_1 """
+        rng = np.random.default_rng(0)
+        BS_X, BS_Y = rng.uniform(-800, 800, size=(2, 3, 1))
+        UE_X, UE_Y = BS_X + rng.uniform(-200, 200, size=(2, 3, 5))
+        UE_Z = np.full((3, 5), 1.5)
+        path_loss = rng.uniform(100, 140, size=(3, 1))
+        steering = rng.uniform(-40, 40, size=(2, 3, 5))
+        interference_dBm, interference_mW = interference.interference(
+            BS_X, BS_Y, 25.0, UE_X, UE_Y, UE_Z, 0.0, 0.0, 4.5, 30.0, path_loss,
+            lambda theta, phi: tuple(steering), antenna.gain_5g, antenna.fss_gain_wbes_b,
+        )
+        for i in range(3):
+            for k in range(5):
+                expected, _ = Simulator.Interface_UMa_1(
+                    BS_X[i, 0], BS_Y[i, 0], 25.0, 0.0, 0.0, 4.5, 30.0, path_loss[i, 0], *steering[:, i, k]
+                )
+                assert interference_dBm[i, k] == pytest.approx(expected, abs=1e-9)
+        np.testing.assert_allclose(interference_mW, 10 ** (interference_dBm / 10))
+
+    def test_pointing_angles(self):
+        """ Pointing angles are between 0 and 360 degrees """
+        theta, phi = interference.pointing_angles(np.array([1.0, -1.0, 3.0]), np.array([1.0, 1.0, -4.0]), 5.5)
+        np.testing.assert_allclose(theta, [45.0, 315.0, np.degrees(np.arctan(-4 / 3)) % 360])
+        np.testing.assert_allclose(phi, np.degrees(np.hypot([1.0, -1.0, 3.0], [1.0, 1.0, -4.0]) / 5.5))
@@ -0,0 +1,51 @@
+import numpy as np
+
+import blockage
+import building_store
+from conftest import LAT_FSS, LON_FSS
+
+
+class TestLOSStore:
+    def test_key_quantization(self):
+        """ Endpoints are rounded to the resolution of the store """
+        store = blockage.LOSStore(":memory:")
+        key = store.key([1.0, 2.0, 10.0], [-3.0, 4.0, 4.5], 7, 2)
+        assert key == (100, 200, 1000, -300, 400, 450, 7, 2)
+        assert store.key([1.004, 1.996, 10.0], [-3.0, 4.0, 4.5], 7, 2) == key
+        assert store.key([1.01, 2.0, 10.0], [-3.0, 4.0, 4.5], 7, 2) != key
+
+    def test_persists_across_reopen(self, tmp_path):
+        """ Results are kept when the store is opened again for the same buildings, dropped for others """
+        store = blockage.LOSStore(tmp_path / "los.sqlite", fingerprint="a")
+        key = store.key([1.0, 2.0, 10.0], [0.0, 0.0, 4.5], 3, 1)
+        store[key] = True
+        store[store.key([1.0, 2.0, 10.0], [0.0, 0.0, 4.5], 3, 2)] = False
+        store.close()
+
+        store = blockage.LOSStore(tmp_path / "los.sqlite", fingerprint="a")
+        assert len(store) == 2 and store.get(key) is True
+        assert store.get(store.key([1.0, 2.0, 10.0], [0.0, 0.0, 4.5], 3, 3)) is None
+        store.close()
+        store = blockage.LOSStore(tmp_path / "los.sqlite", fingerprint="b")
+        assert len(store) == 0
+        store.close()
+
+
+class TestBuildingIds:
+    def test_ids_are_global(self, city):
+        """ A building has the same id in the buildings of every FSS """
+        near = building_store.load_buildings(city / "tiles", LAT_FSS, LON_FSS, 300)
+        far = building_store.load_buildings(city / "tiles", LAT_FSS + 0.005, LON_FSS + 0.005, 3000)
+        assert len(np.unique(far.ids)) == len(far)
+        for i in range(len(near)):
+            j = np.flatnonzero(far.ids == near.ids[i])
+            assert len(j) == 1
+            np.testing.assert_allclose(far[j[0]].xy_points + far.offset, near[i].xy_points + near.offset)
+
+    def test_store_kept_across_fss(self, simulator):
+        """ Changing FSS reuses the LOS results of the tile cache instead of wiping them """
+        sizes = []
+        for lat, lon in [(LAT_FSS, LON_FSS), (LAT_FSS + 0.002, LON_FSS - 0.002), (LAT_FSS, LON_FSS)]:
+            simulator(simulation_count=1, lat_FSS=lat, lon_FSS=lon, los_engine="geometry3d")
+            sizes.append(len(blockage.open_los_store("los.sqlite")))
+        assert 0 < sizes[0] < sizes[1] == sizes[2]
@@ -0,0 +1,57 @@
+import math
+
+import numpy as np
+import pytest
+
+import pathloss
+
+# BS 10 m high at distances from the FSS on both sides of the UMi breakpoint, with the FSS at the origin
+DISTANCES = np.array([20.0, 150.0, 400.0, 1500.0, 4000.0])
+
+
+# UMi LOS path loss (dB) of the scalar model the kernels replaced, without rain
+def umi_los(d_2D):
+    d_3D = math.sqrt(10 ** 2 + d_2D ** 2)
+    D_BP = 4 * 9 * 3.5 * 12e9 / 3e8
+    if 10 <= d_2D <= D_BP:
+        return 32.4 + 21 * math.log10(d_3D) + 20 * math.log10(12)
+    return 32.4 + 40 * math.log10(d_3D) + 20 * math.log10(12) - 9.5 * math.log10(D_BP ** 2 + 5.5 ** 2)
+
+
+class TestPathLoss:
+    def test_umi_los(self):
+        """ The UMi kernel gives the scalar LOS path loss on both sides of the breakpoint """
+        path_loss, d_2D = pathloss.umi_path_loss(DISTANCES, 0.0, 10.0, 0.0, 0.0, 10.0)
+        np.testing.assert_allclose(d_2D, DISTANCES)
+        np.testing.assert_allclose(path_loss, [umi_los(d) for d in DISTANCES])
+
+    @pytest.mark.parametrize("scenario", ["UMi", "UMa", "RMa"])
+    def test_arrays_match_scalars(self, scenario):
+        """ The kernels give every link of an array the path loss of the link alone """
+        crossings = np.array([0, 1, 0, 3, 2])
+        BS_Z = pathloss.BS_HEIGHTS[scenario]
+        path_loss, _ = pathloss.scenario_path_loss(scenario, DISTANCES, 30.0, BS_Z, 0.0, 0.0, 4.5, crossings)
+        for k in range(len(DISTANCES)):
+            alone, _ = pathloss.scenario_path_loss(scenario, DISTANCES[k], 30.0, BS_Z, 0.0, 0.0, 4.5, crossings[k])
+            assert path_loss[k] == pytest.approx(float(alone))
+
+    @pytest.mark.parametrize("scenario", ["UMi", "UMa", "RMa"])
+    def test_blocked_links(self, scenario):
+        """ Blocked links take the NLOS path loss, or the LOS path loss plus a penetration loss per crossing """
+        BS_Z = pathloss.BS_HEIGHTS[scenario]
+        los, _ = pathloss.scenario_path_loss(scenario, DISTANCES, 0.0, BS_Z, 0.0, 0.0, 4.5, 0)
+        nlos, _ = pathloss.scenario_path_loss(scenario, DISTANCES, 0.0, BS_Z, 0.0, 0.0, 4.5, 2)
+        assert np.all(nlos >= los)
+        penetrated, _ = pathloss.scenario_path_loss(scenario, DISTANCES, 0.0, BS_Z, 0.0, 0.0, 4.5, 2,
+                                                    penetration_loss=10.0)
+        np.testing.assert_allclose(penetrated, los + 20.0)
+
+    def test_rain(self):
+        """ Rain only adds its attenuation to the UMi path loss """
+        attenuation = pathloss.rain_attenuation(25.0)
+        assert attenuation > pathloss.rain_attenuation(5.0) > 0
+        dry, _ = pathloss.umi_path_loss(DISTANCES, 0.0, 10.0, 0.0, 0.0, 4.5)
+        wet, _ = pathloss.scenario_path_loss("UMi", DISTANCES, 0.0, 10.0, 0.0, 0.0, 4.5, rain_attenuation=attenuation)
+        np.testing.assert_allclose(wet, dry + attenuation)
+        with pytest.raises(ValueError):
+            pathloss.scenario_path_loss("UMx", DISTANCES, 0.0, 10.0, 0.0, 0.0, 4.5)
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+import pathloss
+import Simulator
+
+
+class TestRainSweep:
+    @pytest.mark.parametrize("rain", [False, True])
+    def test_sweep_matches_runs_at_each_rate(self, simulator, rain):
+        """ Each row of the sweep is the I/N of a run of the same seed at that rain rate """
+        rain_rates = [2.0, 25.0, 80.0]
+        sweep = simulator(rain=rain, rain_rates=rain_rates, seed=5)["rain_sweep"]
+        assert sweep["rain_rates"] == rain_rates
+        for rate, row in zip(rain_rates, sweep["Interference_values_UMi_each_Bs"]):
+            direct = simulator(rain=True, rain_rate=rate, seed=5)["Interference_values_UMi_each_Bs"]
+            np.testing.assert_allclose(row, direct, rtol=0, atol=1e-9)
+
+    def test_scaling(self):
+        """ The sweep scales I/N by the difference of rain attenuation """
+        I_N_W = np.array([1.0, 0.0, 2e-3])
+        sweep = Simulator.rain_sweep_I_N(I_N_W, pathloss.rain_attenuation(10.0), [10.0, 40.0])
+        np.testing.assert_array_equal(sweep[0], I_N_W)
+        extra = pathloss.rain_attenuation(40.0) - pathloss.rain_attenuation(10.0)
+        np.testing.assert_allclose(sweep[1], I_N_W * 10 ** (-extra / 10))
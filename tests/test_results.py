@@ -0,0 +1,21 @@
+import numpy as np
+
+import results
+
+
+class TestSimulationResults:
+    def test_drops_write_into_the_columns(self):
+        """ The results of a drop are views of its row of the columnar results """
+        out = results.SimulationResults(3, 2, fss=2, scenarios=("UMi", "RMa"))
+        drop = out.drop(1)
+        drop.distance[:] = [1, 2, 3, 4]
+        drop.I_N_W["RMa"][:] = [10, 0]
+        np.testing.assert_array_equal(out.distance[1], [1, 2, 3, 4])
+        np.testing.assert_array_equal(out.I_N_W["RMa"], [[0, 0], [10, 0], [0, 0]])
+
+    def test_response(self):
+        """ I/N is reported in dB, 0 where no UE interferes, for UMi and the scenarios of the request """
+        out = results.SimulationResults(2, 2, scenarios=("UMa",))
+        out.I_N_W["UMi"][:] = [[100, 0], [1, 0.1]]
+        np.testing.assert_allclose(out.I_N_dB("UMi"), [20, 0, 0, -10])
+        assert sorted(out.to_dict()) == ["Interference_values_UMa_each_Bs", "Interference_values_UMi_each_Bs"]
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+import ue_drop
+
+BS_X = np.array([0.0, 500.0])
+BS_Y = np.array([0.0, -200.0])
+
+
+class TestDropUEs:
+    def test_positions_and_channels(self):
+        """ UEs are dropped within their sector and radii, no channel serving too many UEs of a sector """
+        ues = ue_drop.drop_ues(np.random.default_rng(0), BS_X, BS_Y, 10, 200, 5)
+        assert len(ues) == len(BS_X) * ue_drop.SECTORS * ue_drop.UES_PER_SECTOR
+        dx, dy = ues["x"] - BS_X[ues["bs"]], ues["y"] - BS_Y[ues["bs"]]
+        assert np.all((np.hypot(dx, dy) >= 10) & (np.hypot(dx, dy) <= 200))
+        azimuth = np.degrees(np.arctan2(dy, dx)) % 360
+        np.testing.assert_array_equal(np.floor(azimuth / (360 / ue_drop.SECTORS)), ues["sector"])
+        for bs in range(len(BS_X)):
+            for sector in range(ue_drop.SECTORS):
+                channels = ues["channel"][(ues["bs"] == bs) & (ues["sector"] == sector)]
+                assert np.bincount(channels).max() <= ue_drop.MAX_UES_PER_CHANNEL
+                assert channels.min() >= 1 and channels.max() <= 5
+
+    def test_drops_axis(self):
+        """ The UEs of several drops are drawn at once, one drop drawing as without the drop axis """
+        ues = ue_drop.drop_ues(np.random.default_rng(1), BS_X, BS_Y, 10, 200, 5, drops=4)
+        assert ues.shape == (4, len(BS_X) * ue_drop.SECTORS * ue_drop.UES_PER_SECTOR)
+        single = ue_drop.drop_ues(np.random.default_rng(1), BS_X, BS_Y, 10, 200, 5)
+        np.testing.assert_array_equal(ue_drop.drop_ues(np.random.default_rng(1), BS_X, BS_Y, 10, 200, 5, drops=1)[0],
+                                      single)
+        assert not np.array_equal(ues[0], ues[1])
+
+    def test_too_many_ues(self):
+        """ A sector cannot have more UEs than its channels can serve """
+        with pytest.raises(ValueError):
+            ue_drop.drop_ues(np.random.default_rng(0), BS_X, BS_Y, 10, 200, 2, ues_per_sector=9)
+
+
+class TestSampleUEs:
+    def test_distinct_and_uniform(self):
+        """ Every link samples distinct UEs, each UE as likely as the others """
+        samples = ue_drop.sample_ues(np.random.default_rng(0), (2000, 3), 40, 30)
+        assert samples.shape == (2000, 3, 30)
+        assert samples.min() >= 0 and samples.max() < 40
+        assert np.all(np.diff(np.sort(samples, axis=-1), axis=-1) > 0)
+        counts = np.bincount(samples.ravel(), minlength=40) / (2000 * 3)
+        np.testing.assert_allclose(counts, 30 / 40, atol=0.02)
+
+    def test_too_many_samples(self):
+        """ No more UEs can be sampled than were dropped """
+        with pytest.raises(ValueError):
+            ue_drop.sample_ues(np.random.default_rng(0), (2,), 10, 11)
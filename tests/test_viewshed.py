@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+import Simulator
+import viewshed
+from conftest import LAT_FSS, LON_FSS, los_context
+
+# BS positions around the FSS of the synthetic city and the BS heights of the deployment scenarios
+BS_POINTS = np.random.default_rng(3).uniform(-900, 900, size=(400, 2))
+HEIGHTS = [10.0, 25.0, 35.0]
+
+
+class TestViewshed:
+    def test_approximates_exact_engines(self, city, tmp_path):
+        """ The viewshed raster gives the LOS of the exact engines on most links, not on all of them """
+        exact = Simulator.scenario_crossings(
+            BS_POINTS[:, 0], BS_POINTS[:, 1], HEIGHTS, 0.0, 0.0, 4.5, los_context(city, "vectorized")
+        )
+        ctx = los_context(city, "viewshed")
+        ctx.viewshed = viewshed.open_viewshed(tmp_path, LAT_FSS, LON_FSS, ctx.buildings, 1300, observer_height=4.5)
+        approximate = Simulator.scenario_crossings(BS_POINTS[:, 0], BS_POINTS[:, 1], HEIGHTS, 0.0, 0.0, 4.5, ctx)
+        agreement = (approximate == exact).mean(axis=(1, 2))
+        assert np.all(agreement >= 0.9)
+        assert np.any(agreement < 1)
+
+    def test_ray_march(self):
+        """ A wall between the FSS and a cell raises its minimum visible height along the line of sight """
+        heights = np.zeros((41, 41))
+        heights[20, 25] = 20.0
+        min_height = viewshed.minimum_visible_height(heights, resolution=1.0, observer_height=4.5)
+        # the wall cell starts 4.5 m east of the FSS, sampled every half cell, so a cell 15 m east needs
+        # 4.5 + 15 * (20 - 4.5) / 4.5 m while the cells north of the FSS see it from the ground
+        assert min_height[20, 35] == pytest.approx(4.5 + 15 * (20 - 4.5) / 4.5)
+        assert min_height[35, 20] <= 4.5
@@ -0,0 +1,78 @@
+"""
+User equipment drops for the CCI-SWIFT ASCENT simulator
+
+Created: Oct 17, 2026
+For SWIFT-ASCENT
+"""
+
+import numpy as np
+
+# sectors of every BS and UEs dropped in each sector
+SECTORS = 3
+UES_PER_SECTOR = 10
+# UEs a BS can serve on one of its channels in a sector
+MAX_UES_PER_CHANNEL = 4
+# height (m) of the UEs
+UE_HEIGHT = 1.5
+
+# one UE: position, the BS and sector serving it and its BS channel, numbered from 1
+UE_DTYPE = np.dtype([
+    ("x", np.float64),
+    ("y", np.float64),
+    ("z", np.float64),
+    ("bs", np.int32),
+    ("sector", np.int32),
+    ("channel", np.int32),
+])
+
+
+# Channels of the UEs of each of the rows of shape (groups, ues), a random permutation of the
+# channel_count * max_per_channel channel slots of a sector so that no channel serves more than
+# max_per_channel UEs. Channels are numbered from 1 as in BS_Channels.
+def assign_channels(rng, groups, ues, channel_count, max_per_channel=MAX_UES_PER_CHANNEL) -> np.ndarray:
+    slots = channel_count * max_per_channel
+    if ues > slots:
+        raise ValueError(f"BS cannot support {ues} UEs on {channel_count} channels of {max_per_channel} UEs")
+    # the first ues of a random permutation of the slots of every sector
+    slot = np.argsort(rng.random((groups, slots)), axis=1)[:, :ues]
+    return slot // max_per_channel + 1
+
+
+# Drop ues_per_sector UEs in each of the sectors of every BS at (BS_X, BS_Y), at a uniform distance
+# between min_radius and max_radius and a uniform azimuth within the sector, sector i covering
+# 360 / sectors degrees from 360 * i / sectors. The UEs are ordered by BS, sector then UE, so UE j of
+# sector i of BS p is at index (p * sectors + i) * ues_per_sector + j. With drops, the UEs of that many
+# drops are drawn at once, of shape (drops, UEs).
+def drop_ues(rng, BS_X, BS_Y, min_radius, max_radius, channel_count, sectors=SECTORS,
+             ues_per_sector=UES_PER_SECTOR, max_per_channel=MAX_UES_PER_CHANNEL, drops=None) -> np.ndarray:
+    BS_X = np.asarray(BS_X, dtype=float)
+    BS_Y = np.asarray(BS_Y, dtype=float)
+    shape = (drops or 1, len(BS_X), sectors, ues_per_sector)
+    sector = np.arange(sectors)[:, None]
+    width = 360 / sectors
+    azimuth = np.radians(rng.uniform(width * sector, width * (sector + 1), size=shape))
+    radius = rng.uniform(min_radius, max_radius, size=shape)
+    channel = assign_channels(rng, shape[0] * len(BS_X) * sectors, ues_per_sector, channel_count, max_per_channel)
+
+    ues = np.empty(shape, dtype=UE_DTYPE)
+    ues["x"] = BS_X[:, None, None] + radius * np.cos(azimuth)
+    ues["y"] = BS_Y[:, None, None] + radius * np.sin(azimuth)
+    ues["z"] = UE_HEIGHT
+    ues["bs"] = np.arange(len(BS_X))[:, None, None]
+    ues["sector"] = sector
+    ues["channel"] = channel.reshape(shape)
+    return ues.reshape(shape[0], -1) if drops else ues.ravel()
+
+
+# count distinct indexes out of range(population) for every element of shape, of shape (*shape, count).
+# Floyd's algorithm, vectorized over the elements, so the cost per element is count ** 2 whatever the
+# population.
+def sample_ues(rng, shape, population, count) -> np.ndarray:
+    if count > population:
+        raise ValueError(f"Cannot sample {count} UEs out of {population}")
+    samples = np.empty(tuple(shape) + (count,), dtype=np.int64)
+    for k, j in enumerate(range(population - count, population)):
+        pick = rng.integers(0, j + 1, size=shape)
+        taken = (samples[..., :k] == pick[..., None]).any(axis=-1)
+        samples[..., k] = np.where(taken, j, pick)
+    return samples